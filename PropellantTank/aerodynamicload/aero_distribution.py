@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# 空力係数の機軸方向分布（dC_N/dx, dC_A/dx）のテーブル
+# CFDやDATCOMの出力のような、マッハ数×迎角ごとの分布を読み込み、荷重計算の節点に割り当てる。
+# 節点への割り当て（remap）は格子ごとに一度だけ計算してキャッシュし、時刻ごとの値は
+# マッハ数・迎角の双線形補間を全時刻まとめて行うので、2点集中荷重のモデルと計算量は変わらない。
+#
+# 対応形式
+# CSV  : 1行目がヘッダ "mach,alpha,x_1,x_2,..."（x_kはノーズからの位置 mm）、
+#        2行目以降が各(マッハ数, 迎角[rad])の分布 dC/dx [1/mm]、行の順番は問わない
+# .npz : x (位置), mach, alpha (格子), dCdx (len(mach), len(alpha), len(x))
+# テーブルの範囲外のマッハ数・迎角は端の値、機軸方向の範囲外は分布0とする。
+import io
+import os
+import numpy as np
+
+class AeroTable:
+	def __init__(self, x, mach, alpha, dCdx):
+		# x : 位置 mm (n_x,)、mach, alpha : 格子 (n_m,), (n_a,)、dCdx : 分布 1/mm (n_m, n_a, n_x)
+		self.x     = np.asarray(x, dtype=float)
+		self.mach  = np.asarray(mach, dtype=float)
+		self.alpha = np.asarray(alpha, dtype=float)
+		self.dCdx  = np.asarray(dCdx, dtype=float).reshape(len(self.mach), len(self.alpha), len(self.x))
+		if np.any(np.diff(self.x) <= 0) or np.any(np.diff(self.mach) <= 0) or np.any(np.diff(self.alpha) <= 0):
+			raise ValueError(u"空力分布テーブルの位置・マッハ数・迎角は昇順に並べてください")
+		self.remapped = {} # 節点配置ごとの節点への割り当て (n_m, n_a, 節点数)
+
+	@classmethod
+	def from_csv(cls, path, delimiter=","):
+		with io.open(path, "r", encoding="utf-8-sig") as f:
+			header = [v.strip() for v in f.readline().split(delimiter)]
+			if header[:2] != ["mach", "alpha"]:
+				raise ValueError(u"空力分布テーブルの1行目は mach,alpha,位置... としてください (%s)" % (path))
+			values = np.loadtxt(f, delimiter=delimiter, ndmin=2)
+		mach  = np.unique(values[:, 0])
+		alpha = np.unique(values[:, 1])
+		if len(values) != len(mach) * len(alpha):
+			raise ValueError(u"空力分布テーブルにマッハ数と迎角の組が揃っていません (%s)" % (path))
+		order = np.lexsort((values[:, 1], values[:, 0])) # マッハ数、迎角の順に並べる
+		return cls(np.array(header[2:], dtype=float), mach, alpha, values[order, 2:])
+
+	@classmethod
+	def from_npz(cls, path):
+		data = np.load(path)
+		return cls(data["x"], data["mach"], data["alpha"], data["dCdx"])
+
+	def remap(self, x):
+		# 節点x[mm]ごとの係数（節点の支配区間で分布を積分したもの、合計は全機の係数）(n_m, n_a, 節点数)
+		# 支配区間は隣の節点との中点まで、テーブルの分布は位置について区分線形とする
+		key = x.tobytes()
+		if key not in self.remapped:
+			bound = np.concatenate([[x[0]], (x[1:] + x[:-1]) / 2.0, [x[-1]]])
+			self.remapped[key] = np.diff(self.integral(bound), axis=-1)
+		return self.remapped[key]
+
+	def integral(self, pos):
+		# 機軸方向の積分 ∫_{-∞}^{pos} dC/dx dx (n_m, n_a, len(pos))
+		f = self.dCdx
+		h = np.diff(self.x)
+		F = np.concatenate([np.zeros(f.shape[:2] + (1,)), np.cumsum((f[..., 1:] + f[..., :-1]) / 2.0 * h, axis=-1)], axis=-1)
+		k = np.clip(np.searchsorted(self.x, pos, side="right") - 1, 0, len(self.x) - 2)
+		s = np.clip(pos - self.x[k], 0, h[k])
+		value = F[..., k] + f[..., k] * s + (f[..., k+1] - f[..., k]) * s**2 / (2 * h[k])
+		return np.where(pos < self.x[0], 0.0, value)
+
+	def __call__(self, mach, alpha, x):
+		# マッハ数・迎角の配列 (時刻数,) に対する節点ごとの係数 (時刻数, 節点数)
+		table = self.remap(x)
+		(i, f) = _bracket(self.mach,  np.atleast_1d(mach))
+		(j, g) = _bracket(self.alpha, np.atleast_1d(alpha))
+		(i1, j1) = (np.minimum(i+1, len(self.mach)-1), np.minimum(j+1, len(self.alpha)-1))
+		(f, g) = (f[:, np.newaxis], g[:, np.newaxis])
+		return ((1-f) * (1-g) * table[i, j]  + f * (1-g) * table[i1, j]
+				+ (1-f) * g   * table[i, j1] + f * g     * table[i1, j1])
+
+def _bracket(grid, value):
+	# 格子gridの中でvalueを挟む下側の番号と重み（範囲外は端の値）
+	value = np.asarray(value, dtype=float)
+	if len(grid) == 1:
+		return np.zeros(len(value), dtype=np.intp), np.zeros(len(value))
+	i = np.clip(np.searchsorted(grid, value, side="right") - 1, 0, len(grid) - 2)
+	f = np.clip((value - grid[i]) / (grid[i+1] - grid[i]), 0.0, 1.0)
+	return i, f
+
+_tables = {} # 読み込んだテーブル {(パス, 更新時刻): AeroTable}、同じファイルは読み直さない
+
+def load_table(path):
+	key = (os.path.abspath(path), os.path.getmtime(path))
+	if key not in _tables:
+		_tables[key] = AeroTable.from_npz(path) if path.lower().endswith(".npz") else AeroTable.from_csv(path)
+	return _tables[key]
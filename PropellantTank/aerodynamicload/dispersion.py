@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# 荷重の分散解析（モンテカルロ）
+# C_A, C_N, x_CP, 動圧, 突風, ジンバル角をばらつかせた多数のケースを、累積和の荷重計算(calc_*_state)に
+# ケース方向の2次元配列としてまとめて流し、位置ごとの平均・標準偏差・最大・最小を集計する。
+# ケースはchunk_size個ずつに分け、workers>1ならプロセスプールで並列に計算する。
+#
+# ばらつかせる量（DISPERSIONに 名前: (平均, 標準偏差) の正規分布で与える）
+# C_A     : 軸力係数 ND（公称の軸力係数との比を分布に掛ける、公称が0の場合は荷重点pos_Aに増分として加える）
+# C_N     : 法線力係数 ND
+# x_CP    : ノーズからの風圧中心位置 mm
+# q_scale : 動圧の倍率 ND（軌道の動圧に掛ける）
+# gust    : 突風による法線力係数の増分 ND（C_Nに加え、分布はx_CPで決まる分布と同じ）
+# gimbal  : ジンバル角 rad（符号付き、横推力 = 推力*sin(gimbal)）、sample_casesのlimitで最大舵角に切る
+#
+# 機体に法線力係数分布のテーブル(set_aero_table)がある場合は、その時刻のテーブルの分布の形のまま
+# 全機の法線力係数をケースのC_N+gustに合わせる（x_CPはばらつかせない）。
+#
+# 各ケースはジンバルの向きを含むので、曲げモーメントは M = M_a + M_d（M1）だけを使う。
+# 等価軸圧縮力は force_A - |M|*4/直径。
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from str_load_calc import calc_axial_load_state, calc_bending_moment_state
+
+FIELDS = ["C_A", "C_N", "x_CP", "q_scale", "gust", "gimbal"]
+DTYPE = np.dtype([(name, np.float64) for name in FIELDS])
+
+# 集計する荷重
+DISPERSION_KEYS = ["force_A", "M", "M_abs", "F_eq_comp"]
+
+def sample_cases(num_case, dispersion, seed=None, limit=None):
+	# dispersion : {名前: (平均, 標準偏差)}、FIELDSのすべてを与える
+	# limit      : {名前: (下限, 上限)}、正規分布の裾をその範囲に切る（ジンバル角の最大舵角など）
+	missing = [name for name in FIELDS if name not in dispersion]
+	if missing:
+		raise ValueError(u"ばらつきの指定がありません: %s" % (", ".join(missing)))
+	rng = np.random.RandomState(seed)
+	cases = np.zeros(num_case, dtype=DTYPE)
+	for name in FIELDS:
+		(mean, sigma) = dispersion[name]
+		cases[name] = mean + sigma * rng.standard_normal(num_case)
+	for (name, (lower, upper)) in (limit or {}).items():
+		cases[name] = np.clip(cases[name], lower, upper)
+	return cases
+
+class DispersionStats:
+	# 位置ごとの平均・分散（Chanの方法で並列に合成できる）と最大・最小
+	def __init__(self, num_station):
+		self.count = 0
+		self.mean  = np.zeros(num_station)
+		self.m2    = np.zeros(num_station) # 偏差の2乗和
+		self.max   = np.full(num_station, -np.inf)
+		self.min   = np.full(num_station,  np.inf)
+
+	def update(self, load):
+		# load : 荷重分布 (ケース数, 位置)
+		other = DispersionStats(load.shape[1])
+		other.count = load.shape[0]
+		other.mean  = np.mean(load, axis=0)
+		other.m2    = np.sum((load - other.mean)**2, axis=0)
+		other.max   = np.max(load, axis=0)
+		other.min   = np.min(load, axis=0)
+		self.merge(other)
+
+	def merge(self, other):
+		count = self.count + other.count
+		if other.count == 0:
+			return
+		delta = other.mean - self.mean
+		self.mean = self.mean + delta * other.count / count
+		self.m2   = self.m2 + other.m2 + delta**2 * self.count * other.count / count
+		self.count = count
+		self.max = np.maximum(self.max, other.max)
+		self.min = np.minimum(self.min, other.min)
+
+	def std(self):
+		return np.sqrt(self.m2 / max(self.count - 1, 1))
+
+	def upper(self, k=3.0):
+		# 平均 + kσ
+		return self.mean + k * self.std()
+
+	def lower(self, k=3.0):
+		# 平均 - kσ
+		return self.mean - k * self.std()
+
+def calc_dispersion_loads(rocket, state, cases, thrust, q):
+	# 1時刻の機体状態stateに対して、ケースごとの荷重を2次元配列(ケース数, 位置)で計算する
+	# stateの分布は1行で、ケース方向にはブロードキャストされる
+	C_N = cases["C_N"] + cases["gust"]
+	state = dict(state)
+	C_A = getattr(rocket, "C_A", 0.0) # テーブルだけの機体はset_C_Aを呼ばない
+	if C_A != 0:
+		state["dC_Adx"] = state["dC_Adx"] * (cases["C_A"] / C_A)[:, np.newaxis]
+	else: # 公称の軸力係数が0だと比で表せないので、ケースのC_Aを荷重点pos_Aの集中荷重として加える
+		rows = np.repeat(state["dC_Adx"][:1], len(cases), axis=0)
+		rows[:, rocket.node(getattr(rocket, "pos_A", 0))] += cases["C_A"]
+		state["dC_Adx"] = rows
+	row = state["dC_Ndx"][0]
+	if rocket.table_N is not None and np.sum(row) != 0:
+		state["dC_Ndx"] = row * (C_N / np.sum(row))[:, np.newaxis]
+	else: # 2点集中荷重（テーブルの分布が0の時刻は形が決まらないので同じく2点集中荷重）
+		state["dC_Ndx"] = rocket.C_N_distribution(cases["x_CP"], C_N)
+	q = q * cases["q_scale"]
+	load = calc_axial_load_state(rocket, state, np.full(len(cases), thrust), q)
+	load.update(calc_bending_moment_state(rocket, state, q, thrust * np.sin(cases["gimbal"])))
+	M_abs = abs(load["M1"])
+	return {"force_A": load["force_A"], "M": load["M1"], "M_abs": M_abs,
+			"F_eq_comp": load["force_A"] - M_abs * 4 / rocket.diameter}
+
+_worker_rocket = None
+
+def _init_worker(rocket):
+	# プロセスごとに一度だけ機体を受け取る（チャンクごとに大きな分布を送らない）
+	global _worker_rocket
+	_worker_rocket = rocket
+
+def _run_chunk(cases, times, thrust, q, keys, rocket=None):
+	# ケースのチャンク1つを全時刻分計算し、時刻ごと・荷重ごとの集計を返す
+	if rocket is None:
+		rocket = _worker_rocket
+	stats = {}
+	for (j, time) in enumerate(times):
+		state = rocket.state(np.array([time]))
+		load = calc_dispersion_loads(rocket, state, cases, thrust[j], q[j])
+		for key in keys:
+			stats[(time, key)] = DispersionStats(len(rocket.x))
+			stats[(time, key)].update(load[key])
+	return stats
+
+def run_dispersion(rocket, cases, times, thrust, q, chunk_size=64, workers=1, keys=DISPERSION_KEYS):
+	# times : 評価する時刻の配列 s、thrust, q : 各時刻の推力 N、動圧 Pa（q_scale倍する前の値）
+	# 戻り値 : {(時刻, 荷重名): DispersionStats}
+	chunks = [cases[start:start+chunk_size] for start in range(0, len(cases), chunk_size)]
+	stats = {(time, key): DispersionStats(len(rocket.x)) for time in times for key in keys}
+	if workers is None or workers > 1:
+		with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rocket,)) as executor:
+			results = executor.map(_run_chunk, chunks, *[[v] * len(chunks) for v in (times, thrust, q, keys)])
+			for result in results:
+				for (name, value) in result.items():
+					stats[name].merge(value)
+	else:
+		for chunk in chunks:
+			for (name, value) in _run_chunk(chunk, times, thrust, q, keys, rocket).items():
+				stats[name].merge(value)
+	return stats
+
+def dispersion_envelope(stats, times, key, k=3.0):
+	# 全時刻にわたる位置ごとの 平均+kσ, 平均-kσ, 最大, 最小 の包絡線
+	upper = np.max([stats[(time, key)].upper(k) for time in times], axis=0)
+	lower = np.min([stats[(time, key)].lower(k) for time in times], axis=0)
+	maximum = np.max([stats[(time, key)].max for time in times], axis=0)
+	minimum = np.min([stats[(time, key)].min for time in times], axis=0)
+	return {"upper": upper, "lower": lower, "max": maximum, "min": minimum}
@@ -1,17 +1,201 @@
 # -*- coding: utf-8 -*-
 # 荷重計算の際に上に凸、原点を通る曲げモーメントの分布が得られる
 # 曲げモーメント分布をノーズを固定端とした片持はり複数の集中荷重による近似をする。
-# ここでは6点の集中荷重として曲線を直線群によってフィッティングを行なう。
+# 集中荷重P_iを位置x_iに置くと曲げモーメントは M(x) = sum_{x_i < x} P_i (x - x_i) でP_iについて線形なので、
+# 全区間をまとめた1つの線形最小二乗問題として、任意の点数の集中荷重を一度に求める。
+# 曲げモーメント曲線を複数（評定時刻や分散解析のケースごと）まとめて与えることもできる。
+# データは位置の昇順に並べたNumPy配列として扱い、区間の境界はnp.searchsortedで求めて区間ごとのビューで計算する
+# （並んでいないデータだけ一度並べ替える）。pandasは__main__のCSVの読み込みにだけ使う。
 
 import numpy as np
-import pandas as pd
-import scipy.optimize
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import matplotlib.font_manager
-from matplotlib.font_manager import FontProperties
-from matplotlib.backends.backend_pdf import PdfPages
-import warnings
+
+def sorted_curve(xdata, ydata, x_end):
+	# 位置の昇順に並べたx < x_endのデータ（並んでいればコピーせずにビューを返す）
+	x = np.asarray(xdata, dtype=float)
+	y = np.asarray(ydata, dtype=float)
+	if np.any(x[1:] < x[:-1]):
+		order = np.argsort(x, kind="stable")
+		(x, y) = (x[order], y[..., order])
+	end = np.searchsorted(x, x_end, side="left")
+	return x[:end], y[..., :end]
+
+def load_starts(x, points):
+	# 集中荷重iが効き始めるデータ番号（x > x_i の先頭、1点目は全範囲なので0）
+	start = np.searchsorted(x, points, side="right")
+	start[0] = 0
+	return start
+
+def design_matrix(xdata, points):
+	# 最小二乗の係数行列 (データ数, 点数)、列iは x - x_i（1点目は全範囲、2点目以降は x > x_i の範囲のみ）
+	# xdataは昇順
+	x = np.asarray(xdata, dtype=float)
+	points = np.asarray(points, dtype=float)
+	A = np.zeros([len(x), len(points)])
+	for (i, start) in enumerate(load_starts(x, points)):
+		np.subtract(x[start:], points[i], out=A[start:, i])
+	return A
+
+def fitting_loads(xdata, ydata, points, x_end):
+	# @input
+	# xdata  : 位置[mm]のデータ列 (データ数,)
+	# ydata  : 曲げモーメント[Nm]のデータ列 (データ数,) または複数の曲線 (曲線数, データ数)
+	# points : 集中荷重を受ける位置 x1, x2, ... [mm]（昇順）、点数は任意
+	# x_end  : 機体の長さ[mm]、x < x_endのデータで近似する
+	# @output
+	# 集中荷重[N] (点数,) または (曲線数, 点数)
+	(x, y) = sorted_curve(xdata, ydata, x_end)
+	(P, residual, rank, sv) = np.linalg.lstsq(design_matrix(x, points), y.T, rcond=None)
+	return P.T * 1000 # [Nm/mm] → [N]
+
+def moment_curve(xdata, points, P):
+	# 集中荷重P[N]による曲げモーメント[Nm] (データ数,) または (曲線数, データ数)、xdataは昇順
+	x = np.asarray(xdata, dtype=float)
+	P = np.asarray(P, dtype=float) / 1000
+	M = np.zeros(P.shape[:-1] + x.shape)
+	for (i, start) in enumerate(load_starts(x, np.asarray(points, dtype=float))):
+		M[..., start:] += P[..., i, np.newaxis] * (x[start:] - points[i])
+	return M
+
+def draw_fitting(ax, xdata, ydata, points, P, x_end, title_name = u""):
+	# 曲げモーメント曲線と集中荷重P[N]による近似の区間ごとの直線をaxに描く（xdataは昇順）
+	x = np.asarray(xdata, dtype=float)
+	fit = moment_curve(x, points, P)
+	bounds = list(load_starts(x, np.asarray(points, dtype=float))) + [len(x)]
+	names = [str(i+1) for i in range(len(points))]
+	ax.plot(x, ydata, "--", label=u"入力値")
+	for i in range(len(points)):
+		section = slice(bounds[i], bounds[i+1])
+		end = names[i+1] if i+1 < len(points) else "E"
+		ax.plot(x[section], fit[section], label=u"近似 区間%s%s x%s = %d mm, P%s = %d N" % (names[i], end, names[i], points[i], names[i], P[i]))
+	for pos in list(points) + [x_end]:
+		ax.axvline(x=pos, color = "k", linestyle="--", alpha = 0.2)
+
+	ax.set_xlabel(u"STA mm")
+	ax.set_ylabel(u"曲げモーメント Nm")
+	ax.set_title(u"%s 曲げモーメントと近似直線" % (title_name))
+	ax.legend(loc="best")
+
+def fitting_lines(xdata, ydata, points, x_end,
+				  plot_flag=False, print_flag=False, savefig_flag=False,
+				  output_name = u"", title_name = u""):
+	# 任意の点数の集中荷重で1本の曲げモーメント曲線を近似する（引数はfitting_6linesと同じ、x1~x6の代わりにpoints）
+	# @output
+	# 位置pointsにかかる集中荷重[N] (点数,)
+	(x, y) = sorted_curve(xdata, ydata, x_end)
+	P = fitting_loads(x, y, points, x_end)
+	names = [str(i+1) for i in range(len(points))]
+
+	if (plot_flag == True):
+		import matplotlib.pyplot as plt # 図を作るときだけ読み込む
+		fig = plt.figure()
+		fig.subplots_adjust(left=0.15)
+		draw_fitting(fig.add_subplot(111), x, y, points, P, x_end, title_name)
+		if (savefig_flag == True):
+			fig.savefig(output_name + u"_fitting.png")
+		plt.close(fig)
+
+	if (print_flag == True):
+		print("==== 曲げモーメントの近似のための集中荷重計算の結果 ====")
+		print("曲線名 : %s" % (output_name))
+		for i in range(len(points)):
+			print("位置 x%s = %.1f mm,\t荷重 P%s = %.1f N" % (names[i], points[i], names[i], P[i]))
+		print("ノーズ位置 x_N = %d" % (x_end))
+
+	return P
+
+def segment_cost(x, y, boundary):
+	# 区間[boundary[a], boundary[b])のデータを1本の直線で近似したときの残差二乗和 (len(boundary), len(boundary))
+	# x, y, x^2, xy, y^2 の累積和をとっておくので、区間ごとのコストは区間の長さによらずO(1)
+	S = [np.concatenate([[0.0], np.cumsum(v)])[boundary] for v in (np.ones_like(x), x, y, x*x, x*y, y*y)]
+	(n, sx, sy, sxx, sxy, syy) = [v[np.newaxis, :] - v[:, np.newaxis] for v in S]
+	with np.errstate(divide="ignore", invalid="ignore"):
+		vxx = sxx - sx * sx / n
+		vxy = sxy - sx * sy / n
+		vyy = syy - sy * sy / n
+		cost = vyy - np.where(vxx > 0, vxy * vxy / vxx, 0.0)
+	# 空の区間（n == 0）と逆向きの区間はinfにして、区切りが重ならないようにする
+	return np.where(n >= 2, np.maximum(cost, 0.0), np.where(n >= 1, 0.0, np.inf))
+
+def fitting_error(xdata, ydata, points, x_end):
+	# 位置pointsの集中荷重で近似したときの残差二乗和
+	(x, y) = sorted_curve(xdata, ydata, x_end)
+	P = fitting_loads(x, y, points, x_end)
+	return np.sum((moment_curve(x, points, P) - y)**2)
+
+def prefix_error(x, y):
+	# データ番号indexの位置に集中荷重を置いたときの連続な折れ線の残差二乗和を返す関数
+	# 列iの和は x >= x_i のデータの和なので、後ろからの累積和で係数行列を作らずに正規方程式を組む
+	# （xは[0, 1]に縮めて桁落ちを抑える、縮めても残差は変わらない）
+	x = (x - x[0]) / max(x[-1] - x[0], 1e-300)
+	S = [np.concatenate([np.cumsum(v[::-1])[::-1], [0.0]]) for v in (np.ones_like(x), x, y, x*x, x*y)]
+	yy = np.dot(y, y)
+	def error(index):
+		index = np.asarray(index)
+		xi = x[index]
+		tail = np.maximum.outer(index, index) # 列i, jがともに0でないデータの先頭
+		tail[0, :] = index[np.newaxis, :] * (np.arange(len(index)) > 0)
+		tail[:, 0] = index * (np.arange(len(index)) > 0)
+		tail[0, 0] = 0
+		(n, sx, sxx) = (S[0][tail], S[1][tail], S[3][tail])
+		AA = sxx - (xi[:, np.newaxis] + xi[np.newaxis, :]) * sx + np.outer(xi, xi) * n
+		start = np.where(np.arange(len(index)) > 0, index, 0)
+		Ay = S[4][start] - xi * S[2][start]
+		P = np.linalg.lstsq(AA, Ay, rcond=None)[0]
+		return yy - np.dot(Ay, P)
+	return error
+
+def optimal_points(xdata, ydata, num_point, x_end, num_candidate=500):
+	# 近似誤差が最小になるnum_point個の集中荷重の位置[mm]を探す（1点目はデータの先頭）
+	# 1. データをnum_candidate個の候補区切りに間引き、区間ごとに独立な直線で近似したときの誤差が最小になる
+	#    区切りを動的計画法で求める（O(点数 × 候補数^2)、区間のコストは累積和でO(1)）
+	# 2. 区切りを集中荷重の位置として、連続な折れ線（fitting_loads）の誤差で1つずつ前後に動かして詰める
+	#    折れ線の正規方程式も累積和で作れるので、位置を動かしたときの誤差はデータ数によらずO(点数^2)
+	(x, y) = sorted_curve(xdata, ydata, x_end)
+	boundary = np.unique(np.linspace(0, len(x), min(num_candidate, len(x)) + 1).astype(int))
+	cost = segment_cost(x, y, boundary)
+	K = len(boundary)
+
+	# error[b] : 候補区切りbまでをk個の区間で近似したときの最小誤差、parent[k][b] : 直前の区切り
+	error  = cost[0].copy()
+	parent = []
+	for k in range(1, num_point):
+		total = error[:, np.newaxis] + cost # (直前の区切りa, 区切りb)
+		parent.append(np.argmin(total, axis=0))
+		error = total[parent[-1], np.arange(K)]
+	cut = [K - 1]
+	for k in reversed(range(num_point - 1)):
+		cut.append(parent[k][cut[-1]])
+	index = [0] + [int(boundary[b]) for b in reversed(cut[1:])] # 各区間の先頭のデータ番号
+
+	# 連続な折れ線の誤差で位置を詰める（動かす幅を候補の間隔から半分ずつ1データまで小さくする）
+	error = prefix_error(x, y)
+	best = error(index)
+	step = max(len(x) // len(boundary), 1)
+	while step >= 1:
+		improved = True
+		while improved:
+			improved = False
+			for i in range(1, num_point):
+				for move in (-step, step):
+					trial = list(index)
+					trial[i] = trial[i] + move
+					if not (trial[i-1] < trial[i] < (trial[i+1] if i+1 < num_point else len(x))):
+						continue
+					value = error(trial)
+					if value < best:
+						(best, index, improved) = (value, trial, True)
+		step = step // 2
+	return x[index]
+
+def fitting_auto(xdata, ydata, num_point, x_end,
+				 plot_flag=False, print_flag=False, savefig_flag=False,
+				 output_name = u"", title_name = u""):
+	# 集中荷重の位置も自動で決めて近似する（位置はoptimal_points）
+	# @output
+	# 集中荷重の位置[mm] (点数,)、集中荷重[N] (点数,)
+	points = optimal_points(xdata, ydata, num_point, x_end)
+	P = fitting_lines(xdata, ydata, points, x_end, plot_flag, print_flag, savefig_flag, output_name, title_name)
+	return points, P
 
 def fitting_6lines(xdata, ydata, x1, x2, x3, x4, x5, x6, x_end,
  				   plot_flag=False, print_flag=False, savefig_flag=False,
@@ -24,96 +208,13 @@ def fitting_6lines(xdata, ydata, x1, x2, x3, x4, x5, x6, x_end,
 	# xxxx_flag : 出力の有無（plot、標準出力文字列、plot保存） True or False
 	# xxxx_name : 保存、plotタイトルの名前
 	# @output
-	# P1 ~ P6 : 位置x1~x6にかかる集中荷重[N] コメントアウトをいじってP9まで対応可
-	def func1(x, P1):
-		return P1 * x - P1 * x1
-	def func2(x, P2):
-		return (P1 + P2) * x - (P1 * x1 + P2 * x2)
-	def func3(x, P3):
-		return (P1 + P2 + P3) * x - (P1 * x1 + P2 * x2 + P3 * x3)
-	def func4(x, P4):
-		return (P1 + P2 + P3 + P4) * x - (P1 * x1 + P2 * x2 + P3 * x3 + P4 * x4)
-	def func5(x, P5):
-		return (P1 + P2 + P3 + P4 + P5) * x \
-		       - (P1 * x1 + P2 * x2 + P3 * x3 + P4 * x4 + P5 * x5)
-	def func6(x, P6):
-		return (P1 + P2 + P3 + P4 + P5 + P6) * x \
-		       - (P1 * x1 + P2 * x2 + P3 * x3 + P4 * x4 + P5 * x5 + P6 * x6)
-	def func7(x, P7):
-		return (P1 + P2 + P3 + P4 + P5 + P6 + P7) * x \
-		       - (P1 * x1 + P2 * x2 + P3 * x3 + P4 * x4 + P5 * x5 + P6 * x6 + P7 * x7)
-	def func8(x, P8):
-		return (P1 + P2 + P3 + P4 + P5 + P6 + P7 + P8) * x \
-		       - (P1 * x1 + P2 * x2 + P3 * x3 + P4 * x4 + P5 * x5 + P6 * x6 + P7 * x7 + P8 * x8)
-	def func9(x, P9):
-		return (P1 + P2 + P3 + P4 + P5 + P6 + P7 + P8 + P9) * x \
-		       - (P1 * x1 + P2 * x2 + P3 * x3 + P4 * x4 + P5 * x5 + P6 * x6 + P7 * x7 + P8 * x8 + P9 * x9)
-
-	with warnings.catch_warnings():
-		warnings.simplefilter("ignore") # 不必要な警告が出るので抑制
-
-		df = pd.DataFrame({"x" : xdata,
-						   "BM" : ydata})
-		parameter_initial = np.array([0.0])
-		P1, pcov = scipy.optimize.curve_fit(func1, df[df.x < x2].x, df[df.x < x2].BM, p0=parameter_initial)
-		P2, pcov = scipy.optimize.curve_fit(func2, df[df.x > x2][df.x < x3].x, df[df.x > x2][df.x < x3].BM, p0=parameter_initial)
-		P3, pcov = scipy.optimize.curve_fit(func3, df[df.x > x3][df.x < x4].x, df[df.x > x3][df.x < x4].BM, p0=parameter_initial)
-		P4, pcov = scipy.optimize.curve_fit(func4, df[df.x > x4][df.x < x5].x, df[df.x > x4][df.x < x5].BM, p0=parameter_initial)
-		P5, pcov = scipy.optimize.curve_fit(func5, df[df.x > x5][df.x < x6].x, df[df.x > x5][df.x < x6].BM, p0=parameter_initial)
-		P6, pcov = scipy.optimize.curve_fit(func6, df[df.x > x6][df.x < x_end].x, df[df.x > x6][df.x < x_end].BM, p0=parameter_initial)
-		# P7, pcov = scipy.optimize.curve_fit(func7, df[df.x > x7][df.x < x8].x, df[df.x > x7][df.x < x8].BM, p0=parameter_initial)
-		# P8, pcov = scipy.optimize.curve_fit(func8, df[df.x > x8][df.x < x_end].x, df[df.x > x8][df.x < x_end].BM, p0=parameter_initial)
-		# P9, pcov = scipy.optimize.curve_fit(func9, df[df.x > x9][df.x < x_end].x, df[df.x > x9][df.x < x_end].BM, p0=parameter_initial)
-
-		if (plot_flag == True):
-			plt.figure()
-			plt.figure().subplots_adjust(left=0.15)
-			plt.plot(df.x, df.BM, "--", label=u"入力値")
-			plt.plot(df[df.x < x2].x, func1(df[df.x < x2].x, P1), label=u"近似 区間12 x1 = %d mm, P1 = %d N" % (x1, P1*1000))
-			plt.plot(df[df.x > x2][df.x < x3].x, func2(df[df.x > x2][df.x < x3].x, P2), label=u"近似 区間23 x2 = %d mm, P2 = %d N" % (x2, P2*1000))
-			plt.plot(df[df.x > x3][df.x < x4].x, func3(df[df.x > x3][df.x < x4].x, P3), label=u"近似 区間34 x3 = %d mm, P3 = %d N" % (x3, P3*1000))
-			plt.plot(df[df.x > x4][df.x < x5].x, func4(df[df.x > x4][df.x < x5].x, P4), label=u"近似 区間45 x4 = %d mm, P4 = %d N" % (x4, P4*1000))
-			plt.plot(df[df.x > x5][df.x < x6].x, func5(df[df.x > x5][df.x < x6].x, P5), label=u"近似 区間56 x5 = %d mm, P5 = %d N" % (x5, P5*1000))
-			plt.plot(df[df.x > x6][df.x < x_end].x, func6(df[df.x > x6][df.x < x_end].x, P6), label=u"近似 区間6E x6 = %d mm, P6 = %d N" % (x6, P6*1000))
-			# plt.plot(df[df.x > x7][df.x < x8].x, func7(df[df.x > x7][df.x < x8].x, P7), label=u"近似 区間78 x7 = %d mm, P7 = %d N" % (x7, P7*1000))
-			# plt.plot(df[df.x > x8][df.x < x_end].x, func8(df[df.x > x8][df.x < x_end].x, P8), label=u"近似 区間8E x8 = %d mm, P8 = %d N" % (x8, P8*1000))
-			# plt.plot(df[df.x > x9][df.x < x_end].x, func9(df[df.x > x9][df.x < x_end].x, P9), label=u"近似 区間9E x9 = %d mm, P9 = %d N" % (x9, P9*1000))
-			plt.axvline(x=x1, color = "k", linestyle="--", alpha = 0.2)
-			plt.axvline(x=x2, color = "k", linestyle="--", alpha = 0.2)
-			plt.axvline(x=x3, color = "k", linestyle="--", alpha = 0.2)
-			plt.axvline(x=x4, color = "k", linestyle="--", alpha = 0.2)
-			plt.axvline(x=x5, color = "k", linestyle="--", alpha = 0.2)
-			plt.axvline(x=x6, color = "k", linestyle="--", alpha = 0.2)
-			# plt.axvline(x=x7, color = "k", linestyle="--", alpha = 0.2)
-			# plt.axvline(x=x8, color = "k", linestyle="--", alpha = 0.2)
-			# plt.axvline(x=x9, color = "k", linestyle="--", alpha = 0.2)
-			plt.axvline(x=x_end, color = "k", linestyle="--", alpha = 0.2)
-			
-			plt.xlabel(u"STA mm")
-			plt.ylabel(u"曲げモーメント Nm")
-			plt.title(u"%s 曲げモーメントと近似直線" % (title_name))
-			plt.legend(loc="best")
-			if (savefig_flag == True):
-				plt.savefig(output_name + u"_fitting.png")
-
-	if (print_flag == True):
-		print("==== 曲げモーメントの近似のための集中荷重計算の結果 ====")
-		print("曲線名 : %s" % (output_name))
-		print("位置 x1 = %.1f mm,\t荷重 P1 = %.1f N" % (x1, P1*1000))
-		print("位置 x2 = %.1f mm,\t荷重 P2 = %.1f N" % (x2, P2*1000))
-		print("位置 x3 = %.1f mm,\t荷重 P3 = %.1f N" % (x3, P3*1000))
-		print("位置 x4 = %.1f mm,\t荷重 P4 = %.1f N" % (x4, P4*1000))
-		print("位置 x5 = %.1f mm,\t荷重 P5 = %.1f N" % (x5, P5*1000))
-		print("位置 x6 = %.1f mm,\t荷重 P6 = %.1f N" % (x6, P6*1000))
-		# print("位置 x7 = %.1f mm,\t荷重 P7 = %.1f N" % (x7, P7*1000))
-		# print("位置 x8 = %.1f mm,\t荷重 P8 = %.1f N" % (x8, P8*1000))
-		# print("位置 x9 = %.1f mm,\t荷重 P9 = %.1f N" % (x9, P9*1000))
-		print("ノーズ位置 x_N = %d" % (x_end))
-
-	return P1 * 1000, P2 * 1000, P3 * 1000, P4 * 1000, P5 * 1000, P6 * 1000
+	# P1 ~ P6 : 位置x1~x6にかかる集中荷重[N]（7点以上はfitting_linesを使う）
+	P = fitting_lines(xdata, ydata, [x1, x2, x3, x4, x5, x6], x_end,
+					  plot_flag, print_flag, savefig_flag, output_name, title_name)
+	return tuple(P)
 
 if __name__ == '__main__':
-	plt.close("all")
+	import pandas as pd # CSVの読み込みだけに使う
 	df = pd.read_csv("test.csv", skiprows=1, names=("x","BM"))
 
 	#x1 = 9888
@@ -133,3 +234,4 @@ if __name__ == '__main__':
 	x_end = 9888
 
 	fitting_6lines(df.x,df.BM, x1, x2, x3, x4, x5, x6, x_end)
+	fitting_auto(df.x,df.BM, 6, x_end, print_flag=True) # 位置も自動で決める場合
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# 荷重分布の包絡線
+# 時刻ごとの分布を受け取って、位置ごとの最大値・最小値とその時刻だけを更新していく
+import numpy as np
+
+# calc_load_envelopeで包絡線をとる荷重
+ENVELOPE_KEYS = ["force_A", "M1", "M2", "M_max", "F_eq_comp", "F_eq_tens", "V_max"]
+
+class LoadEnvelope:
+	def __init__(self, num_station, dtype=np.float64):
+		self.max      = np.full(num_station, -np.inf, dtype=dtype)
+		self.min      = np.full(num_station,  np.inf, dtype=dtype)
+		self.time_max = np.full(num_station, np.nan) # 最大値をとる時刻 秒
+		self.time_min = np.full(num_station, np.nan) # 最小値をとる時刻 秒
+
+	def update(self, times, load):
+		# times : 時刻の配列 (n,)
+		# load  : 荷重分布 (n, 位置)
+		times = np.asarray(times)
+		station = np.arange(load.shape[1])
+
+		i_max = np.argmax(load, axis=0)
+		cur = load[i_max, station]
+		better = cur > self.max # 同値の場合は早い時刻を残す
+		np.copyto(self.max,      cur,           where=better, casting="unsafe") # 配列の型を保ったまま上書き
+		np.copyto(self.time_max, times[i_max], where=better)
+
+		i_min = np.argmin(load, axis=0)
+		cur = load[i_min, station]
+		better = cur < self.min
+		np.copyto(self.min,      cur,           where=better, casting="unsafe")
+		np.copyto(self.time_min, times[i_min], where=better)
+
+	def abs_max(self):
+		# 絶対値の最大
+		return np.maximum(abs(self.max), abs(self.min))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# 荷重計算のライブラリ用インターフェース
+# スクリプト(str_load_calc.pyのmain)を通さずに、サイジングの最適化などから荷重を繰り返し計算するためのもの。
+#
+#   model = LoadModel(rocket, trajectory)  # rocketはfinalize済み、trajectoryは軌道の構造化配列かファイル
+#   result = model.solve([0, 55, 60, 162])  # 時刻ごとの構造化配列
+#   result["M_max"]                         # (時刻数, 節点数) の曲げモーメント Nm
+#
+# 機体の慣性諸元と累積和はRocketにキャッシュされるので、同じ機体でsolveを何度呼んでも再計算しない。
+# ファイル出力や図の作成はしない。
+import numpy as np
+from str_load_calc import calc_loads_state
+from trajectory import FIELDS, load_trajectory
+
+# 時刻ごとの値
+SCALAR_KEYS = ["X_dotdot", "Z_dotdot_a", "Z_dotdot_d", "Omega_dot_a", "Omega_dot_d"]
+# 位置ごとの分布
+STATION_KEYS = ["drag", "force_A", "M_a", "M_d", "M1", "M2", "M_max", "F_eq_comp", "F_eq_tens",
+				"V1", "V2", "V_max", "N_comp", "N_tens", "q_shear"]
+
+class LoadModel:
+	def __init__(self, rocket, trajectory):
+		# rocket     : finalize済みのRocket
+		# trajectory : trajectory.DTYPEの構造化配列（trajectory.make_trajectoryで作れる）またはファイルパス
+		if isinstance(trajectory, str):
+			trajectory = load_trajectory(trajectory)
+		self.rocket     = rocket
+		self.trajectory = np.sort(trajectory, order="time")
+		rocket.prefix_sums()
+
+	def result_dtype(self, keys=STATION_KEYS):
+		num_station = len(self.rocket.x)
+		return np.dtype([("time", np.float64)] + [(key, np.float64) for key in SCALAR_KEYS]
+						+ [(key, np.float64, (num_station,)) for key in keys])
+
+	def inputs(self, times):
+		# 時刻times[s]の軌道の値（軌道の時刻の間は線形補間、範囲外は端の値）
+		data = np.zeros(len(times), dtype=self.trajectory.dtype)
+		for name in FIELDS:
+			data[name] = np.interp(times, self.trajectory["time"], self.trajectory[name])
+		missing = np.isnan(data["x_CP"]) # 風圧中心位置がない時刻は機体に設定した値
+		data["x_CP"][missing] = np.interp(times[missing], np.arange(self.rocket.burntime), self.rocket.x_CP)
+		return data
+
+	def solve(self, times=None, keys=STATION_KEYS, chunk_size=64):
+		# times : 計算する時刻 s（省略時は軌道の全時刻）、keys : 結果に含める分布
+		# 戻り値 : result_dtype(keys)の構造化配列、分布は result[key] で (時刻数, 節点数)
+		times = self.trajectory["time"] if times is None else np.atleast_1d(np.asarray(times, dtype=np.float64))
+		result = np.zeros(len(times), dtype=self.result_dtype(keys))
+		result["time"] = times
+		for start in range(0, len(times), chunk_size):
+			index = slice(start, start+chunk_size)
+			data  = self.inputs(times[index])
+			state = self.rocket.state(data["time"], data["x_CP"], data["mach"], data["alpha"])
+			load  = calc_loads_state(self.rocket, state, data["thrust"], data["q"], data["thrust"]*np.sin(data["gimbal"]))
+			for key in SCALAR_KEYS + list(keys):
+				result[key][index] = load[key]
+		return result
+
+if __name__ == '__main__':
+	# 空力分布テーブルだけで設定した機体（set_C_A, set_C_Nなし）の確認
+	from str_load_calc import Component, Rocket
+	from aero_distribution import AeroTable
+	from trajectory import make_trajectory
+	burntime = 20
+	rocket = Rocket(burntime, 2.0, dx=10)
+	for component in [Component(3000, 235, 0, 0, burntime), Component(5000, 600, 19000, 100, burntime, 0.5),
+					  Component(1000, 1000, 0, 0, burntime)]:
+		rocket.add_component(component)
+	x = np.linspace(0, 9000, 10)
+	table_A = AeroTable(x, [0.5, 2.0], [0.0, 0.1], np.full((2, 2, len(x)), 0.7/9000))
+	table_N = AeroTable(x, [0.5, 2.0], [0.0, 0.1], np.full((2, 2, len(x)), 2.1/9000))
+	rocket.set_x_CP(6600)
+	rocket.set_aero_table(table_A, table_N, mach=1.0, alpha=0.05)
+	rocket.finalize()
+	time = np.arange(burntime, dtype=float)
+	trajectory = make_trajectory(time, np.full(burntime, 5.0e5), np.full(burntime, 3.0e4), np.full(burntime, 0.01),
+								 mach=1.0, alpha=0.05)
+	result = LoadModel(rocket, trajectory).solve([0.0, 5.5, 19.0])
+	print(u"最大曲げモーメント[Nm] :", result["M_max"].max(axis=1))
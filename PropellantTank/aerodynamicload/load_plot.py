@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# 荷重計算結果の図の作成
+# 計算とは切り離し、保存した計算結果(load_result)から図を作る。計算後に別プロセスで動かす(render_background)か、
+# 必要になったときに単独で実行する。
+#
+#   python load_plot.py ZERO_Ph6F_NP_Case1_result [保存名]
+#
+# pyplotを使わずにAggのFigureを1つだけ作り、ページごとに消して描き直す（ウィンドウもpyplotの状態も持たない）。
+# 図のファイル名は str_load_calc.py で直接描いていたときと同じ。
+from __future__ import print_function
+import sys
+import multiprocessing
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from load_result import load_result
+from fitting import draw_fitting, sorted_curve
+
+def _axes(fig, result, alpha=0.2, zero=False):
+	# 分割点の縦線を入れた新しいページ
+	fig.clf()
+	ax = fig.add_subplot(111)
+	if zero:
+		ax.axhline(y=0, color = "k", linestyle="--", alpha = 0.2)
+	for j in result["divid"]:
+		ax.axvline(x=j, color = "k", linestyle="--", alpha = alpha)
+	ax.set_xlabel("STA mm")
+	return ax
+
+def _pages(result, save_name):
+	# (ファイル名の末尾, 描画関数) を出力順に返す
+	# 曲げモーメントのフィッティング結果(fitting.*)があれば、評定時刻ごとの内訳の後に近似の図を入れる
+	x     = result["x"]
+	label = result.meta["rating_label"]
+	cell_width = np.append(np.diff(x), 1.0) # 集中質量を線密度[kg/mm]で表示するための区間幅
+
+	def rating_lines(key, scale=1.0):
+		def draw(ax):
+			for (i, name) in enumerate(label):
+				ax.plot(x, scale * result[key][i], label = "%s" % (name))
+		return draw
+
+	def mass(fig):
+		ax = _axes(fig, result, alpha=0.1)
+		for (i, name) in enumerate(label):
+			ax.plot(x, result["dmdx"][i] / cell_width, label = "%s" % (name))
+		ax.set_ylabel("mass distribution kg/mm")
+		ax.set_title("mass distribution")
+		ax.legend(loc="best")
+
+	def coefficient(key, ylabel, title):
+		def draw(fig):
+			ax = _axes(fig, result)
+			ax.plot(x, result[key][0], linewidth=5)
+			ax.set_xlabel("STA [mm]")
+			ax.set_ylabel(ylabel)
+			ax.set_xlim([-100, x[-1]+100])
+			ax.set_title(title)
+		return draw
+
+	def axial(fig):
+		ax = _axes(fig, result)
+		rating_lines("force_A")(ax)
+		ax.set_ylabel("Axial load N")
+		ax.set_ylim(ymin=-18000)
+		ax.set_title("Axial load")
+		ax.legend(loc="best")
+
+	def breakdown(i):
+		def draw(fig):
+			ax = _axes(fig, result, zero=True)
+			ax.plot(x, result["M_a"][i], label = "Air Force")
+			ax.plot(x, result["M_d"][i], label = "Gimbal")
+			ax.legend(loc = "best")
+			ax.set_ylabel("Bending Moment Nm")
+			ax.set_title("%s Breakdown of BMD" % (label[i]))
+		return draw
+
+	def summary(key, ylabel, title, zero=True, scale=1.0, ymin=None):
+		def draw(fig):
+			ax = _axes(fig, result, zero=zero)
+			rating_lines(key, scale)(ax)
+			ax.set_ylabel(ylabel)
+			if ymin is not None:
+				ax.set_ylim(ymin=ymin)
+			ax.set_title(title)
+			ax.legend(loc="best")
+		return draw
+
+	pages = [("_load_calculation_mass distribution", mass),
+			 ("_load_calculation_dCAdx", coefficient("dC_Adx", "dC_A/dx [kg/mm]", r"$\frac{dC_A}{dx}$")),
+			 ("_load_calculation_dCNdx", coefficient("dC_Ndx", "dC_N/dx [kg/mm]", r"$\frac{dC_N}{dx}$")),
+			 ("_load_calculation_axial_load", axial)]
+	def fitting(key, i):
+		def draw(fig):
+			fig.clf()
+			fig.subplots_adjust(left=0.15)
+			x_end = result["divid"][-1]
+			(x_fit, M) = sorted_curve(x, result[key][i], x_end)
+			draw_fitting(fig.add_subplot(111), x_fit, M, result["fitting.%s.points" % key][i], result["fitting.%s.P" % key][i],
+						 x_end, "%s_%s_%s" % (save_name, sign[key], label[i]))
+		return draw
+
+	sign = {"M1": "M++", "M2": "M+-"}
+	for (i, name) in enumerate(label):
+		pages.append(("_load_calculation_bending_moment_%s" % (name), breakdown(i)))
+		pages += [("_%s_%s_fitting" % (sign[key], name), fitting(key, i))
+				  for key in ["M1", "M2"] if "fitting.%s.P" % key in result]
+	pages += [("_load_calculation_BendingMoment_same_sign",      summary("M1",    "Bending Moment Nm", "Bending Moment (Airforce + Gimbal)")),
+			  ("_load_calculation_BendingMoment_different_sign", summary("M2",    "Bending Moment Nm", "Bending Moment (Airforce - Gimbal)")),
+			  ("_load_calculation_BendingMoment_Max",            summary("M_max", "Bending Moment Nm", "Max Bending Moment(abs)")),
+			  ("_load_calculation_ShearForce_Max",               summary("V_max", "Shear Force N",     "Max Shear Force(abs)", zero=False)),
+			  ("_load_calculation_equivalent_axial_force_compressive",
+			   summary("F_eq_comp", "Axial force N", "Equivalent Axial Force (Compression)", zero=False, scale=-1.0, ymin=0))]
+	return pages
+
+def render(result_file, save_name=None, savefig_flag=True, savepdf_flag=True):
+	# result_file : load_resultで保存した計算結果、save_name : 出力ファイル名の先頭（省略時は計算時の名前）
+	result = load_result(result_file)
+	if save_name is None:
+		save_name = result.meta["name"]
+	fig = Figure()
+	FigureCanvasAgg(fig)
+	pdf = PdfPages(save_name + u"_plot.pdf") if savepdf_flag else None
+	try:
+		for (suffix, draw) in _pages(result, save_name):
+			draw(fig)
+			if(savefig_flag):fig.savefig(save_name + suffix + ".png")
+			if(savepdf_flag):pdf.savefig(fig)
+	finally:
+		if pdf is not None:
+			pdf.close()
+		result.close()
+
+def render_background(result_file, save_name=None, savefig_flag=True, savepdf_flag=True):
+	# 別プロセスで図を作る、戻り値のプロセスはjoin()で終了を待てる（待たなくてもPythonの終了時に待つ）
+	process = multiprocessing.Process(target=render, args=(result_file, save_name, savefig_flag, savepdf_flag))
+	process.start()
+	return process
+
+if __name__ == '__main__':
+	if len(sys.argv) < 2:
+		print(u"使い方: python load_plot.py 計算結果 [保存名]")
+		sys.exit(1)
+	render(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
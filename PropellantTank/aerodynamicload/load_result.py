@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# 荷重計算結果の保存と読み込み（列ごとのバイナリ）
+# 節点位置、評定時刻の分布、包絡線、評定荷重などを名前つきの配列として1か所にまとめ、
+# 後段（板厚サイジング、タンク応力など）がCSVやテキストを読み直さずに使えるようにする。
+#
+# 形式
+# ディレクトリ : 配列ごとに <名前>.npy、入力値や単位などは meta.json
+#                np.load(mmap_mode="r")で読むので、使う配列の使う部分だけがメモリに載る
+# .npz         : 同じ内容を1ファイルにまとめたもの（meta.jsonは"__meta__"という文字列の配列）、
+#                多数のケースを保管する用で、compress=Trueなら圧縮する（読むときは配列ごとに展開される）
+#
+# 配列の名前は "envelope.M_max.max" のように "." で階層を表す。
+#
+#   result = load_result("ZERO_Ph6F_NP_Case1_result")
+#   result["x"], result["M_max"][i_time], result.meta["units"]["M_max"]
+import io
+import json
+import os
+import numpy as np
+
+META_FILE = "meta.json"
+META_KEY  = "__meta__"
+
+def save_result(path, arrays, meta=None, compress=False):
+	# arrays : {名前: 配列}（SliceArrayなどnp.asarrayで配列になるもの）、meta : JSONにできる辞書
+	meta = dict(meta or {})
+	meta["arrays"] = {name: {"shape": list(np.shape(value)), "dtype": str(np.asarray(value).dtype)}
+					  for (name, value) in arrays.items()}
+	if path.lower().endswith(".npz"):
+		data = {name: np.asarray(value) for (name, value) in arrays.items()}
+		data[META_KEY] = np.array(json.dumps(meta, ensure_ascii=False))
+		(np.savez_compressed if compress else np.savez)(path, **data)
+		return path
+	if not os.path.isdir(path):
+		os.makedirs(path)
+	for (name, value) in arrays.items():
+		np.save(os.path.join(path, name + ".npy"), np.asarray(value))
+	with io.open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+		f.write(json.dumps(meta, ensure_ascii=False, indent=1))
+	return path
+
+class LoadResult:
+	# 保存した結果、result[名前]で配列（ディレクトリ形式はmmap）、result.metaで付帯情報
+	def __init__(self, path, mmap_mode="r"):
+		self.path = path
+		self.mmap_mode = mmap_mode
+		self.cache = {}
+		if path.lower().endswith(".npz"):
+			self.npz  = np.load(path)
+			self.meta = json.loads(str(self.npz[META_KEY]))
+		else:
+			self.npz = None
+			with io.open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+				self.meta = json.load(f)
+
+	def keys(self):
+		return list(self.meta["arrays"])
+
+	def __contains__(self, name):
+		return name in self.meta["arrays"]
+
+	def __getitem__(self, name):
+		if name not in self:
+			raise KeyError(u"結果に含まれない配列です: %s (%s)" % (name, self.path))
+		if name not in self.cache:
+			if self.npz is None:
+				self.cache[name] = np.load(os.path.join(self.path, name + ".npy"), mmap_mode=self.mmap_mode)
+			else:
+				self.cache[name] = self.npz[name]
+		return self.cache[name]
+
+	def group(self, prefix):
+		# "envelope.M_max" → {"max": ..., "min": ..., "time_max": ..., "time_min": ...}
+		head = prefix + "."
+		return {name[len(head):]: self[name] for name in self.keys() if name.startswith(head)}
+
+	def close(self):
+		self.cache = {}
+		if self.npz is not None:
+			self.npz.close()
+
+def load_result(path, mmap_mode="r"):
+	return LoadResult(path, mmap_mode)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# 荷重計算の配列をコンパクトに持つための入れ物
+# 時刻×位置の密な配列の代わりに、計算した時刻の行（または重複のない行）だけを持ち、
+# array[time] で従来の密な配列と同じように1時刻分の分布を取り出せるようにする。
+import tracemalloc
+import numpy as np
+
+class SliceArray(np.lib.mixins.NDArrayOperatorsMixin):
+	def __init__(self, rows, index):
+		# rows  : 実際に持つ行 (k, 位置)
+		# index : 時刻→rowsの行番号 (時刻数,)、-1は未計算の時刻
+		self.rows  = rows
+		self.index = np.asarray(index, dtype=np.intp)
+
+	@classmethod
+	def from_times(cls, times, rows, num_time, dtype=np.float64):
+		# 計算した時刻timesの行rowsだけを持つ
+		index = np.full(num_time, -1, dtype=np.intp)
+		index[np.asarray(times)] = np.arange(len(times))
+		return cls(np.asarray(rows, dtype=dtype), index)
+
+	@classmethod
+	def from_keys(cls, keys, build_row, dtype=np.float64):
+		# 時刻ごとのキー（風圧中心位置など）が同じ時刻は同じ行を共有する
+		unique, inverse = np.unique(keys, return_inverse=True)
+		rows = np.array([build_row(key) for key in unique], dtype=dtype)
+		return cls(rows, inverse.ravel())
+
+	@property
+	def shape(self):
+		return (len(self.index),) + self.rows.shape[1:]
+
+	@property
+	def dtype(self):
+		return self.rows.dtype
+
+	@property
+	def times(self):
+		return np.flatnonzero(self.index >= 0)
+
+	@property
+	def nbytes(self):
+		return self.rows.nbytes + self.index.nbytes
+
+	def __len__(self):
+		return len(self.index)
+
+	def __getitem__(self, time):
+		i = self.index[time]
+		if np.any(i < 0):
+			raise KeyError(u"計算していない時刻です: %s" % (time,))
+		return self.rows[i]
+
+	def dense(self):
+		# 従来形式の密な配列（未計算の時刻は0）
+		out = np.zeros(self.shape, dtype=self.dtype)
+		times = self.times
+		out[times] = self.rows[self.index[times]]
+		return out
+
+	def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+		# 四則演算やnp.maximumは持っている行同士で計算する（時刻の対応が同じもの同士に限る）
+		if method != "__call__" or "out" in kwargs:
+			return NotImplemented
+		index = None
+		args = []
+		for value in inputs:
+			if isinstance(value, SliceArray):
+				if index is not None and not (index is value.index or np.array_equal(index, value.index)):
+					raise ValueError(u"時刻の対応が異なるSliceArray同士は演算できません")
+				index = value.index
+				args.append(value.rows)
+			else:
+				args.append(value)
+		return SliceArray(ufunc(*args, **kwargs), index)
+
+def owned_nbytes(array, counted=None):
+	# 配列が実際に確保しているメモリ[byte]、ビューは元の配列をたどって重複しないように数える
+	if counted is None:
+		counted = set()
+	if isinstance(array, SliceArray):
+		return owned_nbytes(array.rows, counted) + owned_nbytes(array.index, counted)
+	if isinstance(array, dict):
+		return sum(owned_nbytes(v, counted) for v in array.values())
+	if isinstance(array, (list, tuple)):
+		return sum(owned_nbytes(v, counted) for v in array)
+	if not isinstance(array, np.ndarray):
+		return 0
+	while isinstance(array.base, np.ndarray):
+		array = array.base
+	if id(array) in counted:
+		return 0
+	counted.add(id(array))
+	return array.nbytes
+
+def footprint(arrays):
+	# {名前: 配列} のメモリ使用量[byte]の辞書と合計
+	counted = set()
+	table = {name: owned_nbytes(array, counted) for (name, array) in arrays.items()}
+	return table, sum(table.values())
+
+def format_bytes(nbytes):
+	return u"%.1f MB" % (nbytes / 1024.0**2)
+
+class PeakMemory:
+	# start()からstop()まで（またはwith文の中）のnumpy配列を含むメモリ確保のピーク[byte]を測る
+	def start(self):
+		self.started = not tracemalloc.is_tracing()
+		if self.started:
+			tracemalloc.start()
+		tracemalloc.reset_peak()
+		self.base = tracemalloc.get_traced_memory()[0]
+		self.peak = 0
+		return self
+
+	def stop(self):
+		self.peak = tracemalloc.get_traced_memory()[1] - self.base
+		if self.started:
+			tracemalloc.stop()
+		return self.peak
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *args):
+		self.stop()
+		return False
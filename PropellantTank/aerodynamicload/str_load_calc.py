@@ -4,20 +4,14 @@
 # 参考文献：液体ロケットの構造システム設計
 from __future__ import print_function
 
-import sys
+from collections import namedtuple
 import numpy as np
-import scipy.integrate as integrate
 from scipy.interpolate import interp1d
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import matplotlib.font_manager
-from matplotlib.font_manager import FontProperties
-from matplotlib.backends.backend_pdf import PdfPages
 import time as tm
-from fitting import fitting_6lines
-
-plt.close("all")
-process_start = tm.time()
+from load_envelope import LoadEnvelope, ENVELOPE_KEYS
+from load_storage import SliceArray, footprint, format_bytes, PeakMemory
+from trajectory import read_trajectory
+from load_result import save_result
 
 class Component:
 	def __init__(self, length, weight_dry, prop_init, prop_end, burntime, press=0.0):
@@ -34,37 +28,57 @@ class Component:
 		self.density = self.weight_dry/self.length*np.ones([burntime,self.length])
 
 		# 推進剤セット
+		# 各時刻の推進剤ブロック数（液面位置）を求め、後端からnum_block_prop個のセルを初期線密度で埋める
+		# 端数はブロックのすぐ前方のセル（機体前端を超える場合は先頭セル）に加える
 		if self.prop_init != 0.0:
 			density_prop_init = prop_init/self.length # 初期推進剤線密度
-			for time in range(self.burntime):
-				num_block_prop = int(self.prop[time]/density_prop_init+1e-8)
-				array_current_prop = density_prop_init*np.ones(self.length)
-				array_current_prop[0:self.length-num_block_prop]=0
-				self.density[time] = self.density[time] + array_current_prop
-				amari = self.weight_wet[time]-sum(self.density[time])
-				if amari < -1e-8:
-					print("ERROR: NEGATIVE MASS")
-					print(time,self.burntime,num_block_prop,self.length,array_current_prop,amari)
-					exit(1)
-
-				if abs(amari)>1e-8:
-				    self.density[time][-num_block_prop-1] = self.density[time][-num_block_prop-1] + amari
-					
-		# 整合性確認
-		for time in range(self.burntime):
-			
-			if abs(sum(self.density[time])-self.weight_wet[time])>1e-8:
-				print(u"ERROR: 質量と密度積分値が一致しません。")
-				print(self.weight_wet[time]-sum(self.density[time]),density_prop_init)
-				exit(1)
+			num_block_prop = (self.prop/density_prop_init+1e-8).astype(int)
+			cell = np.arange(self.length)
+			self.density += density_prop_init * (cell >= self.length - num_block_prop[:, np.newaxis])
+			amari = self.weight_wet - np.sum(self.density, axis=1)
+			if np.any(amari < -1e-8):
+				time = np.flatnonzero(amari < -1e-8)
+				raise ValueError(u"ERROR: NEGATIVE MASS (時刻 %s 秒, 不足 %s kg)" % (time, amari[time]))
+			time = np.flatnonzero(abs(amari) > 1e-8)
+			self.density[time, np.maximum(self.length - num_block_prop[time] - 1, 0)] += amari[time]
 
-	def show(self):
-		print(u"[%d mm,\t%d kg,\t%d kg,\t%d kg]" %(self.length, self.weight_dry, self.prop_init, self.prop_end))
+		# 整合性確認
+		error = np.sum(self.density, axis=1) - self.weight_wet
+		if np.any(abs(error) > 1e-8):
+			time = np.flatnonzero(abs(error) > 1e-8)
+			raise ValueError(u"ERROR: 質量と密度積分値が一致しません。(時刻 %s 秒, 差 %s kg)" % (time, error[time]))
+
+	def lumped_mass(self, s):
+		# 節点s[mm]（部品前端0から後端lengthまでの昇順）に集中させた質量 (時刻, len(s))
+		# 1 mmセルの質量(位置kの集中質量)を両側の節点に距離で按分するので、質量と1次モーメントが保存される
+		# s=0,1,...,lengthのときはdensityそのもの
+		s = np.asarray(s, dtype=float)
+		k = np.arange(self.length)
+		cell = np.searchsorted(s, k, side="right") - 1
+		w = (k - s[cell]) / (s[cell+1] - s[cell]) # 後方の節点への按分比
+		edge = np.searchsorted(k, s) # 節点区間ごとのセル番号の境界
+		out = np.zeros([self.burntime, len(s)])
+		for (weight, node) in [(1 - w, slice(0, -1)), (w, slice(1, None))]:
+			cum = np.zeros([self.burntime, self.length+1])
+			np.cumsum(self.density * weight, axis=1, out=cum[:, 1:])
+			out[:, node] += np.diff(cum[:, edge], axis=1)
+		return out
+
+	def show(self, file=None):
+		print(u"[%d mm,\t%d kg,\t%d kg,\t%d kg]" %(self.length, self.weight_dry, self.prop_init, self.prop_end), file=file)
 
 class Rocket:
-	def __init__(self, burntime, diameter):
+	def __init__(self, burntime, diameter, dx=1, dx_min=None, cluster_width=0):
 		# 以下はFinalizeが必要
 		# dmdx
+		# 節点は間隔dx[mm]の一様格子に分割点と荷重点を加えたもの
+		# dx_min(<dx)を指定すると分割点・荷重点の前後cluster_width[mm]以内を間隔dx_minで細かくする
+		# dmdx[time][j]は節点jに集中させた質量(kg、dx=1ではkg/mm)、部品の質量を前後の節点に按分して
+		# 質量と重心位置を保存する
+		self.dx            = dx
+		self.dx_min        = dx if dx_min is None else dx_min
+		self.cluster_width = cluster_width
+		self.finalized     = False
 		self.burntime   = burntime
 		self.length     = 0
 		self.weight_dry = 0
@@ -80,10 +94,17 @@ class Rocket:
 		self.diameter= diameter
 		self.area = 1.0/4 * np.pi * diameter**2 # 面積 m2
 		self.divid = [0]
+		self.components = [] # add_componentで加えた部品、dmdxはfinalizeで一度に組み立てる
+		self.prefix = None   # dmdxの累積和のキャッシュ(prefix_sums)
+		self.table_A = None  # 空力係数分布のテーブル(set_aero_table)
+		self.table_N = None
+		self.x_CP_table = None # table_Nの分布の図心（各秒の風圧中心位置） mm
+		self.aero_mach  = np.zeros(self.burntime)
+		self.aero_alpha = np.zeros(self.burntime)
 
 	def add_component(self, component):
-		# 部品を加えてロケットのパラメータを更新
-		length_start = self.length
+		# 部品を加えてロケットのパラメータを更新（分布の組み立てはfinalizeで行う）
+		self.components.append(component)
 
 		self.length     = self.length     + component.length
 		self.weight_dry = self.weight_dry + component.weight_dry
@@ -92,107 +113,349 @@ class Rocket:
 
 		self.divid.append(self.length)
 
-		self.dmdx = np.concatenate((self.dmdx,np.zeros([self.burntime, component.length])),axis=1)
-		#self.inertia_distribution = np.zeros([self.burntime, self.length])
-		for time in range(self.burntime):
-			self.dmdx[time][length_start:self.length] = component.density[time]
-
 	def set_C_A(self, C_A):
 		# 部品を加えた後に軸力係数をセット
 		# C_A:全機の軸力係数、今後は入力を分布にできるように関数だけ用意
-		self.C_A = C_A
-		self.dC_Adx = np.zeros([self.burntime, self.length+1])
-		for time in range(self.burntime):
-			self.dC_Adx[time][0] = C_A
+		# 分布は節点が決まるfinalizeで作る
+		self.C_A   = C_A
+		self.pos_A = 0 # 荷重点 mm
+		if self.finalized: self.set_dC_Adx()
+
+	def set_dC_Adx(self):
+		# テーブルがあれば各秒のマッハ数・迎角の分布
+		if self.table_A is not None:
+			rows = self.table_A(self.aero_mach, self.aero_alpha, self.x)
+			self.dC_Adx = SliceArray.from_times(np.arange(self.burntime), rows, self.burntime)
+			return
+		# 全時刻同じ分布なので1行だけ持つ
+		row = np.zeros(len(self.x))
+		row[self.node(self.pos_A)] = self.C_A
+		self.dC_Adx = SliceArray(row[np.newaxis], np.zeros(self.burntime, dtype=np.intp))
 
 	def set_C_N(self, C_N, nose, fin, engine):
 		# 部品を加えた後に法線力係数をセット
 		# C_N：全機の法線力係数、今後は入力を分布にできるように関数を用意
-		self.dC_Ndx = np.zeros([self.burntime, self.length+1])
-		pos_nose = int(nose.length/2)
-		pos_fin  = int(self.length - (engine.length + fin.length / 2))
-		for time in range(self.burntime):
-			self.C_N_nose = C_N * (self.x_CP[time] - pos_fin ) / (pos_nose - pos_fin)
-			self.C_N_tail = C_N * (self.x_CP[time] - pos_nose) / (pos_fin - pos_nose)
-			self.dC_Ndx[time][pos_nose] = self.C_N_nose
-			self.dC_Ndx[time][pos_fin]  = self.C_N_tail
+		# 分布は節点が決まるfinalizeで作る
+		self.C_N      = C_N
+		self.pos_nose = int(nose.length/2) # 荷重点 mm
+		self.pos_fin  = int(self.length - (engine.length + fin.length / 2))
+		if self.finalized: self.set_dC_Ndx()
+
+	def set_dC_Ndx(self):
+		# テーブルがあれば各秒のマッハ数・迎角の分布、分布の図心をx_CP_tableに入れる（入力のx_CPは変えない）
+		if self.table_N is not None:
+			rows = self.table_N(self.aero_mach, self.aero_alpha, self.x)
+			self.dC_Ndx = SliceArray.from_times(np.arange(self.burntime), rows, self.burntime)
+			C_N = np.sum(rows, axis=1)
+			self.x_CP_table = np.where(C_N != 0, np.dot(rows, self.x) / np.where(C_N != 0, C_N, 1.0), self.x_CP)
+			return
+		# 分布は風圧中心位置だけで決まるので、風圧中心位置が同じ時刻は同じ行を共有する
+		self.dC_Ndx = SliceArray.from_keys(self.x_CP, lambda x_CP: self.C_N_distribution(x_CP)[0])
+
+	def C_N_distribution(self, x_CP, C_N=None):
+		# 風圧中心位置x_CP[mm]の配列に対する法線力係数分布 (len(x_CP), 節点数)
+		# C_Nを配列で与えるとその行ごとの法線力係数で作る（省略時はset_C_Nの値）
+		x_CP = np.atleast_1d(np.asarray(x_CP, dtype=float))
+		C_N = self.C_N if C_N is None else np.asarray(C_N, dtype=float)
+		rows = np.zeros([len(x_CP), len(self.x)])
+		rows[:, self.node(self.pos_nose)] = C_N * (x_CP - self.pos_fin ) / (self.pos_nose - self.pos_fin)
+		rows[:, self.node(self.pos_fin)]  = C_N * (x_CP - self.pos_nose) / (self.pos_fin - self.pos_nose)
+		return rows
+
+	def set_aero_table(self, table_A=None, table_N=None, mach=0.0, alpha=0.0):
+		# 空力係数を機軸方向の分布テーブル(aero_distribution.AeroTableまたはファイルパス)で与える
+		# mach, alpha : 各秒のマッハ数・迎角 rad（スカラーは全時刻同じ値）
+		# 与えたテーブルはset_C_A, set_C_Nの集中荷重より優先する
+		from aero_distribution import load_table
+		self.table_A = load_table(table_A) if isinstance(table_A, str) else table_A
+		self.table_N = load_table(table_N) if isinstance(table_N, str) else table_N
+		self.aero_mach  = mach  * np.ones(self.burntime)
+		self.aero_alpha = alpha * np.ones(self.burntime)
+		if self.finalized:
+			if self.table_A is not None: self.set_dC_Adx()
+			if self.table_N is not None: self.set_dC_Ndx()
+
+	def load_points(self):
+		# 集中荷重を受ける位置 mm
+		points = []
+		if hasattr(self, "pos_A"): points.append(self.pos_A)
+		if hasattr(self, "pos_nose"): points.extend([self.pos_nose, self.pos_fin])
+		return points
+
+	def grid(self):
+		# 節点位置 mm、分割点と荷重点は必ず節点にする
+		key = np.unique(np.concatenate([self.divid, self.load_points()]).astype(float))
+		nodes = [np.arange(0, self.length, self.dx, dtype=float), [self.length], key]
+		if self.dx_min < self.dx and self.cluster_width > 0:
+			offset = np.arange(-self.cluster_width, self.cluster_width + self.dx_min/2.0, self.dx_min)
+			nodes.append((key[:, np.newaxis] + offset).ravel())
+		x = np.unique(np.round(np.concatenate(nodes), 6))
+		return x[(x >= 0) & (x <= self.length)]
+
+	def node(self, pos):
+		# 位置pos[mm]の節点番号
+		return int(np.searchsorted(self.x, pos))
 
 	def set_x_CP(self, x_CP):
 		self.x_CP = x_CP*np.ones(self.burntime)
 
 	def finalize(self):
-		# dmdxの境界値処理(機体後端を0)
-		self.x = np.arange(rocket.length+1)
-		self.dmdx = np.concatenate((self.dmdx,np.zeros([self.burntime, 1])),axis=1)
-
-		# 慣性諸元計算
-		for time in range(self.burntime):
-			self.mass[time]    = np.sum(self.dmdx[time])
-			self.x_CG[time]    = np.sum(self.dmdx[time] * self.x)
-			self.inertia[time] = np.sum(self.dmdx[time] * self.x ** 2)
-
-			self.x_CG[time]    = self.x_CG[time] / self.mass[time] # [mm]
-			self.inertia[time] = self.inertia[time] - self.mass[time] * self.x_CG[time] ** 2 # [kg*mm2]
-
-
-def calc_axial_load(rocket,thrust_a,q_a,rating_time):
-	drag     = np.zeros([rocket.burntime, rocket.length+1])
-	force_A  = np.zeros([rocket.burntime, rocket.length+1])
+		# dmdxを一度だけ確保して部品の分布を書き込む(dx=1では機体後端の境界値は0)
+		# 部品の後端の節点は次の部品の先頭の節点と共有なので足し合わせる
+		self.x = self.grid()
+		self.cell_width  = np.append(np.diff(self.x), 1.0) # 線密度[kg/mm]で表示するための区間幅 mm
+		self.divid_index = [self.node(pos) for pos in self.divid] # 分割点の節点番号
+		self.node_segment = np.maximum(np.searchsorted(self.divid_index, np.arange(len(self.x))) - 1, 0) # 節点jが(i_start, i_end]に入る部品番号
+		self.weight = np.stack([np.ones(len(self.x)), self.x, self.x ** 2], axis=1) # 質量・1次・2次モーメントの重み
+		self.dmdx = np.zeros([self.burntime, len(self.x)])
+		self.component_moment = np.zeros([len(self.components), self.burntime, 3])
+		for (i, component) in enumerate(self.components):
+			(index, lumped) = self.component_mass(i, component)
+			self.dmdx[:, index] += lumped
+			# 慣性諸元計算、部品ごとの質量・1次・2次モーメントを全時刻まとめて行列ベクトル積で求める
+			self.component_moment[i] = np.dot(lumped, self.weight[index])
+
+		self.prefix = None
+		self.set_mass_properties()
+
+		self.finalized = True
+		if hasattr(self, "C_A") or self.table_A is not None: self.set_dC_Adx()
+		if hasattr(self, "C_N") or self.table_N is not None: self.set_dC_Ndx()
+
+	def component_mass(self, i, component):
+		# i番目の部品位置にcomponentを置いたときの節点番号の範囲と集中質量 (時刻, 部品の節点数)
+		index = slice(self.divid_index[i], self.divid_index[i+1]+1)
+		return (index, component.lumped_mass(self.x[index] - self.divid[i]))
+
+	def set_mass_properties(self):
+		self.mass_moment = np.sum(self.component_moment, axis=0)
+		[self.mass, self.x_CG, self.inertia] = self.mass_properties(self.mass_moment)
+
+	def update_component(self, i, component):
+		# finalize後にi番目の部品を同じ長さの部品に置き換える（質量・推進剤の変更）
+		# その部品の区間の分布と累積和、全体の慣性諸元だけを更新し、ほかの部品の累積和は計算し直さない
+		# 区間の分布は差分を足さずに部品から組み立て直す（finalizeと同じ順に足すので作り直した場合と一致する）
+		old = self.components[i]
+		if component.length != old.length or component.burntime != self.burntime:
+			raise ValueError(u"置き換える部品は長さと燃焼時間が同じである必要があります")
+		self.components[i] = component
+		(index, lumped) = self.component_mass(i, component)
+		self.dmdx[:, index] = 0.0
+		for (j, other) in enumerate(self.components):
+			# 区間の両端の節点は隣の部品と共有なので、区間に重なる部品をすべて足す
+			start = max(index.start, self.divid_index[j])
+			stop  = min(index.stop, self.divid_index[j+1]+1)
+			if start >= stop:
+				continue
+			lumped_j = lumped if j == i else self.component_mass(j, other)[1]
+			self.dmdx[:, start:stop] += lumped_j[:, start-self.divid_index[j]:stop-self.divid_index[j]]
+		self.weight_dry = 0
+		self.prop       = np.zeros(self.burntime)
+		self.weight_wet = 0
+		for other in self.components:
+			self.weight_dry = self.weight_dry + other.weight_dry
+			self.prop       = self.prop       + other.prop
+			self.weight_wet = self.weight_wet + other.weight_wet
+
+		self.component_moment[i] = np.dot(lumped, self.weight[index])
+		self.set_mass_properties()
+		if self.prefix is not None:
+			self.set_segment_prefix(i, lumped)
+			self.set_prefix_offset()
+
+	def mass_properties(self, moment):
+		# 質量・1次・2次モーメントから質量[kg]、重心位置[mm]、重心まわりの慣性モーメント[kg*mm2]
+		mass    = moment[:, 0]
+		x_CG    = moment[:, 1] / mass
+		inertia = moment[:, 2] - mass * x_CG ** 2
+		return [mass, x_CG, inertia]
+
+	def prefix_sums(self):
+		# 荷重計算に使うdmdx, x*dmdx, x^2*dmdxの累積和(P0, P1, P2)を全時刻分求めてキャッシュする（以後のstateに含まれる）
+		# 同じ機体で荷重計算を何度も繰り返す場合（最適化など）に使う、メモリは節点数×燃焼時間×3配列
+		# 部品ごとに 部品内の累積和(local) + 前方の部品の合計(offset) の形で持つので、
+		# update_componentではその部品の区間と部品数分のoffsetだけを更新すればよい
+		if self.prefix is None:
+			self.prefix = {"local":  {key: np.zeros([self.burntime, len(self.x)]) for key in ["P0", "P1", "P2"]},
+						   "total":  {key: np.zeros([self.burntime, len(self.components)]) for key in ["P0", "P1", "P2"]}}
+			for (i, component) in enumerate(self.components):
+				self.set_segment_prefix(i, self.component_mass(i, component)[1])
+			self.set_prefix_offset()
+		return self.prefix
+
+	def set_segment_prefix(self, i, lumped):
+		# 部品iの節点(i_start, i_end]に部品内の累積和、totalに部品の合計を入れる
+		i_start = self.divid_index[i]
+		i_end   = self.divid_index[i+1]
+		for (k, key) in enumerate(["P0", "P1", "P2"]):
+			cum = np.cumsum(lumped * self.weight[i_start:i_end+1, k], axis=1)
+			self.prefix["local"][key][:, i_start+1:i_end+1] = cum[:, :-1]
+			self.prefix["total"][key][:, i] = cum[:, -1]
+
+	def set_prefix_offset(self):
+		# 各部品より前方の部品の合計 (時刻, 部品数)
+		self.prefix["offset"] = {key: exclusive_cumsum(total) for (key, total) in self.prefix["total"].items()}
+
+	def state(self, times, x_CP=None, mach=None, alpha=None):
+		# 時刻times[s]の機体状態（荷重計算に使う分布と慣性諸元）
+		# 整数の時刻はその秒の値、小数の時刻は前後の秒の分布を線形補間する（燃焼時間外は端の値）
+		# x_CPを与えた場合は法線力係数分布をその風圧中心位置で作る（set_C_Nの2点集中荷重のみ、table_Nがあればテーブルを使う）
+		# mach, alphaを与えた場合は分布テーブルのある係数をその値で引く（nanの時刻は機体に設定した値）
+		times = np.asarray(times)
+		if np.issubdtype(times.dtype, np.integer):
+			rows = lambda source: source[times]
+		else:
+			t = np.clip(times, 0, self.burntime-1)
+			i = np.minimum(t.astype(int), self.burntime-2)
+			f = (t - i)[:, np.newaxis]
+			rows = lambda source: interpolate_rows(source, i, f)
+		state = {"dmdx": rows(self.dmdx), "dC_Adx": rows(self.dC_Adx)}
+		if self.prefix is not None:
+			for key in ["P0", "P1", "P2"]:
+				state[key] = rows(self.prefix["local"][key])
+				state[key] += rows(self.prefix["offset"][key])[:, self.node_segment]
+			state["cum_dmdx"] = state["P0"] + state["dmdx"]
+		if x_CP is not None and self.table_N is None and hasattr(self, "C_N"):
+			state["dC_Ndx"] = self.C_N_distribution(x_CP)
+		else:
+			state["dC_Ndx"] = rows(self.dC_Ndx)
+		if mach is not None and (self.table_A is not None or self.table_N is not None):
+			second = np.arange(self.burntime)
+			mach  = np.where(np.isnan(mach),  np.interp(times, second, self.aero_mach),  mach)
+			alpha = np.where(np.isnan(alpha), np.interp(times, second, self.aero_alpha), alpha)
+			if self.table_A is not None: state["dC_Adx"] = self.table_A(mach, alpha, self.x)
+			if self.table_N is not None: state["dC_Ndx"] = self.table_N(mach, alpha, self.x)
+		[state["mass"], state["x_CG"], state["inertia"]] = self.mass_properties(rows(self.mass_moment))
+		return state
+
+
+def interpolate_rows(source, i, f):
+	# source[i]*(1-f) + source[i+1]*f を作業配列を増やさずに計算する（時刻方向の線形補間）
+	lower = source[i]
+	out = source[i+1]
+	out -= lower
+	out *= f
+	out += lower
+	return out
+
+def calc_axial_load_state(rocket,state,thrust,q):
+	# 機体状態state(Rocket.state)と推力thrust[N]、動圧q[Pa]の配列から軸力を2次元配列(時刻, 位置)で計算する
+	mass  = state["mass"][:, np.newaxis]
+	q     = np.asarray(q)[:, np.newaxis]
+	C_A   = np.sum(state["dC_Adx"], axis=1, keepdims=True)
+	X_dotdot = (np.asarray(thrust)[:, np.newaxis] - rocket.area * q * C_A) / mass # [m/s2]
+	drag     = rocket.area * q * np.cumsum(state["dC_Adx"], axis=1)
+	cum_dmdx = state["cum_dmdx"] if "cum_dmdx" in state else np.cumsum(state["dmdx"], axis=1)
+	force_A  = - drag - X_dotdot * cum_dmdx
+	return {"X_dotdot": X_dotdot[:, 0], "drag": drag, "force_A": force_A}
+
+def calc_axial_load_batch(rocket,thrust_a,q_a,times):
+	# 複数時刻の軸力を2次元配列(時刻, 位置)でまとめて計算する
+	times = np.asarray(times)
+	return calc_axial_load_state(rocket,rocket.state(times),thrust_a[times],q_a[times])
+
+def calc_axial_load(rocket,thrust_a,q_a,rating_time,dtype=np.float64):
+	# 分布はrating_timeの行だけを持つSliceArrayで返す（drag[time]で従来通り取り出せる）
+	# dtype=np.float32にすると分布のメモリが半分になる（計算自体はfloat64）
 	X_dotdot = np.zeros(rocket.burntime)
 	#for time in range(burntime): # for all the duration.
-	for time in rating_time:
-		X_dotdot[time] = (thrust_a[time] - rocket.area * q_a[time] * rocket.C_A) / rocket.mass[time] # [m/s2]
-		drag[time] = rocket.area * q_a[time] * np.cumsum(rocket.dC_Adx[time])
-		force_A[time] = - drag[time] - X_dotdot[time] * np.cumsum(rocket.dmdx[time])
+	load = calc_axial_load_batch(rocket,thrust_a,q_a,rating_time)
+	X_dotdot[rating_time] = load["X_dotdot"]
+	drag    = SliceArray.from_times(rating_time, load["drag"],    rocket.burntime, dtype)
+	force_A = SliceArray.from_times(rating_time, load["force_A"], rocket.burntime, dtype)
 	return [X_dotdot,drag,force_A]
 
-def calc_bending_moment(rocket,thrust_a,q_a,rating_time):
-	M_a  = np.zeros([rocket.burntime, rocket.length+1])
-	M_a1 = np.zeros([rocket.burntime, rocket.length+1])
-	M_a2 = np.zeros([rocket.burntime, rocket.length+1])
-	M_d  = np.zeros([rocket.burntime, rocket.length+1])
-	M_d1 = np.zeros([rocket.burntime, rocket.length+1])
-	M_d2 = np.zeros([rocket.burntime, rocket.length+1])
-	M1   = np.zeros([rocket.burntime, rocket.length+1])
-	M2   = np.zeros([rocket.burntime, rocket.length+1])
-	Z_dotdot_d  = np.zeros(rocket.burntime)
-	Z_dotdot_a  = np.zeros(rocket.burntime)
-	Omega_dot_d = np.zeros(rocket.burntime)
-	Omega_dot_a = np.zeros(rocket.burntime)
-	#for time in range(burntime): # for all the duration 
-	for time in rating_time:
-		#if(time%10==0):print(u"曲げモーメント計算：燃焼時間 %d 秒"% (time)) # for all the duration
-		## Symbol:
-		# *_d: Moment by Gimbal
-		# *_a: Moment by Air Force
-
-		# gimbal
-		Z_dotdot_d[time]  = T_g_a[time] / rocket.mass[time] # [m/s2]
-		Omega_dot_d[time] = T_g_a[time] * rocket.x_CG[time] / rocket.inertia[time] # [m/mm/s2]
-		for pos in range(rocket.length+1):
-			M_d1[time][pos] =   T_g_a[time] * pos * 1e-3 # [Nm]
-			M_d2[time][pos] = - np.sum(\
-					      (Z_dotdot_d[time] + Omega_dot_d[time]*(rocket.x_CG[time]- rocket.x[:pos]))\
-					    * rocket.dmdx[time][:pos]\
-					    * (pos - rocket.x[:pos])) * 1e-3 # [Nm]
-
-		# air force
-		Z_dotdot_a[time]  = rocket.area * q_a[time] * np.sum(rocket.dC_Ndx[time]) / rocket.mass[time] # [m/s2]
-		Omega_dot_a[time] = rocket.area * q_a[time] * np.sum(rocket.dC_Ndx[time]*(rocket.x_CG[time]-rocket.x)) / rocket.inertia[time] # [m/mm/s2]
-
-		for pos in range(rocket.length+1):
-			M_a1[time][pos] = + rocket.area * q_a[time] * np.sum(rocket.dC_Ndx[time][:pos] * (pos - rocket.x[:pos])) * 1e-3 # [Nm]
-			M_a2[time][pos] = - np.sum(\
-					      (Z_dotdot_a[time] + Omega_dot_a[time]*(rocket.x_CG[time]- rocket.x[:pos]))\
-					    * rocket.dmdx[time][:pos]\
-					    * (pos - rocket.x[:pos])) * 1e-3 # [Nm]
+def exclusive_cumsum(a):
+	# 機体頭側からの累積和、pos番目の値はa[...,:pos]の和（posより前方の寄与のみ）
+	out = np.zeros(np.shape(a))
+	np.cumsum(a[..., :-1], axis=-1, out=out[..., 1:])
+	return out
+
+def inertia_moment(Z_dotdot, Omega_dot, x_CG, x, P0, P1, P2):
+	# 慣性力による曲げモーメント sum_{j<pos} (Z_dotdot + Omega_dot*(x_CG-x_j)) * dmdx_j * (x_pos - x_j)
+	# P0, P1, P2 : dmdx, x*dmdx, x^2*dmdx の累積和(exclusive_cumsum)
+	# a - Omega_dot*x_j (a = Z_dotdot + Omega_dot*x_CG) を展開して累積和だけで表す
+	a = Z_dotdot + Omega_dot * x_CG
+	return a * (x * P0 - P1) - Omega_dot * (x * P1 - P2)
+
+def inertia_shear(Z_dotdot, Omega_dot, x_CG, P0, P1):
+	# 慣性力によるせん断力 sum_{j<pos} (Z_dotdot + Omega_dot*(x_CG-x_j)) * dmdx_j（inertia_momentのxでの微分）
+	a = Z_dotdot + Omega_dot * x_CG
+	return a * P0 - Omega_dot * P1
+
+def calc_bending_moment_state(rocket,state,q,T_g):
+	# 機体状態state(Rocket.state)と動圧q[Pa]、ジンバル横推力T_g[N]の配列から曲げモーメントを計算する
+	## Symbol:
+	# *_d: Moment by Gimbal
+	# *_a: Moment by Air Force
+	# 各位置posのモーメントはpos前方の荷重の和 sum_{j<pos} F_j*(pos-x_j) = pos*sum(F_j) - sum(F_j*x_j)
+	# なので累積和を一度とればO(L)で全位置が求まる
+	# せん断力はpos前方の荷重の和 sum_{j<pos} F_j で、同じ累積和から求まる（V_*、上向き正 N）
+	x      = rocket.x
+	dmdx   = state["dmdx"]
+	dC_Ndx = state["dC_Ndx"]
+	mass    = state["mass"][:, np.newaxis]
+	x_CG    = state["x_CG"][:, np.newaxis]
+	inertia = state["inertia"][:, np.newaxis]
+	q       = np.asarray(q)[:, np.newaxis]
+	T_g     = np.asarray(T_g)[:, np.newaxis]
+	if "P0" in state:
+		(P0, P1, P2) = (state["P0"], state["P1"], state["P2"])
+	else:
+		P0 = exclusive_cumsum(dmdx)
+		P1 = exclusive_cumsum(dmdx * x)
+		P2 = exclusive_cumsum(dmdx * x ** 2)
+
+	# gimbal
+	Z_dotdot_d  = T_g / mass # [m/s2]
+	Omega_dot_d = T_g * x_CG / inertia # [m/mm/s2]
+	M_d1 = T_g * x * 1e-3 # [Nm]
+	M_d2 = - inertia_moment(Z_dotdot_d, Omega_dot_d, x_CG, x, P0, P1, P2) * 1e-3 # [Nm]
+	V_d  = T_g - inertia_shear(Z_dotdot_d, Omega_dot_d, x_CG, P0, P1) # [N]
+
+	# air force
+	Z_dotdot_a  = rocket.area * q * np.sum(dC_Ndx, axis=1, keepdims=True) / mass # [m/s2]
+	Omega_dot_a = rocket.area * q * np.sum(dC_Ndx*(x_CG-x), axis=1, keepdims=True) / inertia # [m/mm/s2]
+	C0 = exclusive_cumsum(dC_Ndx)
+	C1 = exclusive_cumsum(dC_Ndx * x)
+	M_a1 = + rocket.area * q * (x * C0 - C1) * 1e-3 # [Nm]
+	M_a2 = - inertia_moment(Z_dotdot_a, Omega_dot_a, x_CG, x, P0, P1, P2) * 1e-3 # [Nm]
+	V_a  = rocket.area * q * C0 - inertia_shear(Z_dotdot_a, Omega_dot_a, x_CG, P0, P1) # [N]
+
 	M_a = M_a1 + M_a2
 	M_d = M_d1 + M_d2
 	M1 = M_a + M_d
 	M2 = M_a - M_d
 	M_max = np.maximum (abs(M1),abs(M2))
+	V1 = V_a + V_d
+	V2 = V_a - V_d
+	V_max = np.maximum(abs(V1),abs(V2))
+	return {"M_a": M_a, "M_d": M_d, "M1": M1, "M2": M2, "M_max": M_max,
+			"V_a": V_a, "V_d": V_d, "V1": V1, "V2": V2, "V_max": V_max,
+			"Z_dotdot_d": Z_dotdot_d[:, 0], "Z_dotdot_a": Z_dotdot_a[:, 0],
+			"Omega_dot_d": Omega_dot_d[:, 0], "Omega_dot_a": Omega_dot_a[:, 0]}
+
+def calc_bending_moment_batch(rocket,q_a,T_g_a,times):
+	# 複数時刻の曲げモーメントを2次元配列(時刻, 位置)でまとめて計算する
+	times = np.asarray(times)
+	return calc_bending_moment_state(rocket,rocket.state(times),q_a[times],T_g_a[times])
+
+def calc_bending_moment(rocket,thrust_a,q_a,T_g_a,rating_time,dtype=np.float64):
+	# 分布はrating_timeの行だけを持つSliceArrayで返す、V_maxは最大せん断力(abs) N
+	Z_dotdot_d  = np.zeros(rocket.burntime)
+	Z_dotdot_a  = np.zeros(rocket.burntime)
+	Omega_dot_d = np.zeros(rocket.burntime)
+	Omega_dot_a = np.zeros(rocket.burntime)
+	#for time in range(burntime): # for all the duration 
+	load = calc_bending_moment_batch(rocket,q_a,T_g_a,rating_time)
+	[M_a, M_d, M1, M2, M_max, V_max] = [SliceArray.from_times(rating_time, load[key], rocket.burntime, dtype)
+										for key in ["M_a", "M_d", "M1", "M2", "M_max", "V_max"]]
+	Z_dotdot_d[rating_time]  = load["Z_dotdot_d"]
+	Z_dotdot_a[rating_time]  = load["Z_dotdot_a"]
+	Omega_dot_d[rating_time] = load["Omega_dot_d"]
+	Omega_dot_a[rating_time] = load["Omega_dot_a"]
 	
-	return [M_a, M_d, M1, M2, M_max, Z_dotdot_d, Z_dotdot_a, Omega_dot_d, Omega_dot_a]
+	return [M_a, M_d, M1, M2, M_max, Z_dotdot_d, Z_dotdot_a, Omega_dot_d, Omega_dot_a, V_max]
 
 def calc_equivalent_axial_force(force_A,M_max,diameter):
 	F_eq_comp = force_A-M_max*4/diameter
@@ -200,21 +463,103 @@ def calc_equivalent_axial_force(force_A,M_max,diameter):
 
 	return [F_eq_comp, F_eq_tens]
 
+def calc_running_load(F_eq_comp,F_eq_tens,V_max,diameter):
+	# 円筒外板の周方向1mmあたりの荷重 N/mm（直径diameter[m]）
+	# 軸方向 : 等価軸力/周長（= 軸力/周長 ± 曲げによる最大の線荷重 M/(pi*R^2)）
+	# せん断流 : 最大せん断流 V/(pi*R)（薄肉円筒の中立軸位置）
+	circumference = np.pi * diameter * 1e3 # [mm]
+	N_comp  = F_eq_comp / circumference
+	N_tens  = F_eq_tens / circumference
+	q_shear = V_max * 2 / circumference
+	return [N_comp, N_tens, q_shear]
+
+def calc_loads_state(rocket,state,thrust,q,T_g):
+	# 軸力、曲げモーメント、等価軸力を複数時刻まとめて計算する（各値は(時刻, 位置)の2次元配列）
+	load = calc_axial_load_state(rocket,state,thrust,q)
+	load.update(calc_bending_moment_state(rocket,state,q,T_g))
+	load["F_eq_comp"], load["F_eq_tens"] = calc_equivalent_axial_force(load["force_A"],load["M_max"],rocket.diameter)
+	load["N_comp"], load["N_tens"], load["q_shear"] = calc_running_load(load["F_eq_comp"],load["F_eq_tens"],load["V_max"],rocket.diameter)
+	return load
+
+def calc_loads(rocket,thrust_a,q_a,T_g_a,times):
+	times = np.asarray(times)
+	return calc_loads_state(rocket,rocket.state(times),thrust_a[times],q_a[times],T_g_a[times])
+
+def calc_load_envelope(rocket,thrust_a,q_a,T_g_a,times=None,chunk_size=16,keys=ENVELOPE_KEYS,dtype=np.float64):
+	# 全時刻（timesを指定した場合はその時刻）の荷重を計算し、位置ごとの最大・最小とその時刻だけを残す
+	# chunk_size個の時刻ずつ2次元配列で計算するので、全時刻分の分布をメモリに持たない
+	# メモリのピークはおおよそ chunk_size × 節点数 × 8 byte × 荷重の種類数
+	if times is None:
+		times = np.arange(rocket.burntime)
+	times = np.asarray(times)
+	envelope = {key: LoadEnvelope(len(rocket.x), dtype) for key in keys}
+	for start in range(0, len(times), chunk_size):
+		chunk = times[start:start+chunk_size]
+		load = calc_loads(rocket,thrust_a,q_a,T_g_a,chunk)
+		for key in keys:
+			envelope[key].update(chunk, load[key])
+	return envelope
+
+def calc_trajectory_envelope(rocket,trajectory,chunk_size=16,keys=ENVELOPE_KEYS,dtype=np.float64):
+	# 軌道ファイルの時刻歴（trajectory.read_trajectoryのチャンク）を順に流して荷重の包絡線をとる
+	# ファイルのチャンクをさらにchunk_size行ずつ計算するので、ファイルの長さによらずメモリは一定
+	# ジンバル横推力は thrust*sin(gimbal)、x_CPがnanの時刻は機体に設定した風圧中心位置を使う
+	# 機体に空力分布テーブルがあれば軌道のマッハ数・迎角で分布を引く
+	if isinstance(trajectory, str):
+		trajectory = read_trajectory(trajectory)
+	rocket.prefix_sums() # 累積和は一度だけ求め、チャンクごとには計算しない
+	envelope = {key: LoadEnvelope(len(rocket.x), dtype) for key in keys}
+	for data in trajectory:
+		for start in range(0, len(data), chunk_size):
+			chunk = data[start:start+chunk_size]
+			time  = chunk["time"]
+			x_CP  = np.where(np.isnan(chunk["x_CP"]), np.interp(time, np.arange(rocket.burntime), rocket.x_CP), chunk["x_CP"])
+			state = rocket.state(time, x_CP, chunk["mach"], chunk["alpha"])
+			load = calc_loads_state(rocket,state,chunk["thrust"],chunk["q"],chunk["thrust"]*np.sin(chunk["gimbal"]))
+			for key in keys:
+				envelope[key].update(time, load[key])
+	return envelope
+
+# 区間ごとの評定荷重、最大となる節点番号と時刻（符号signの側に荷重がない区間は0, -1, nan）
+RatingLoad = namedtuple("RatingLoad", ["load", "station", "time"])
+
+def rating_loads(loads,divid,rating_time,signs):
+	# 複数の荷重をまとめて区間ごとの評定荷重を求める
+	# loads : {名前: 荷重分布}（load[rating_time]で(時刻, 位置)が取り出せるもの）、signs : {名前: 1 or -1}
+	# 区間iは節点divid[i]からdivid[i+1]まで（終端の節点を含む）
+	# 時刻方向に最大をとった後、区間ごとに並べた節点番号の上でnp.maximum.reduceatをとる
+	names = list(loads)
+	rating_time = np.asarray(rating_time)
+	sign = np.array([signs[name] for name in names], dtype=float)[:, np.newaxis]
+	rows = np.stack([np.asarray(loads[name][rating_time]) for name in names]) * sign[:, np.newaxis] # (荷重, 時刻, 位置)
+	i_time = np.argmax(rows, axis=1)
+	value  = np.take_along_axis(rows, i_time[:, np.newaxis], axis=1)[:, 0]
+
+	divid  = np.asarray(divid)
+	length = np.diff(divid) + 1
+	start  = np.concatenate([[0], np.cumsum(length)[:-1]])
+	station = np.repeat(divid[:-1] - start, length) + np.arange(np.sum(length)) # 区間ごとに並べた節点番号
+	v = value[:, station]
+	peak  = np.maximum.reduceat(v, start, axis=1)
+	first = np.minimum.reduceat(np.where(v == np.repeat(peak, length, axis=1), np.arange(len(station)), len(station)), start, axis=1)
+	pos   = station[first]
+
+	positive = peak > 0
+	time = rating_time[np.take_along_axis(i_time, pos, axis=1)]
+	return {name: RatingLoad(np.where(positive[k], peak[k] * sign[k], 0.0),
+							 np.where(positive[k], pos[k], -1),
+							 np.where(positive[k], time[k], np.nan))
+			for (k, name) in enumerate(names)}
+
 def calc_rating_load(load,divid,rating_time,sign):
-	load_rating = []
-	for i in range(len(divid)-1):
-		i_start = divid[i]
-		i_end   = divid[i+1]+1
-		val = 0
-		for j,time in enumerate(rating_time):
-			cur = max(load[time][i_start:i_end]*sign)
-			val = max(val,cur)
-		load_rating.append(val*sign)
-	return load_rating
+	# 1つの荷重の区間ごとの評定荷重のリスト
+	if isinstance(load, list):
+		load = np.asarray(load)
+	return list(rating_loads({"load": load},divid,rating_time,{"load": sign})["load"].load)
 
-if __name__ == "__main__":
+def main():
+	process_start = tm.time()
 	print(u"****** IST 荷重計算プログラム ******")
-	g0 = 9.80665
 
 	#======諸元入力ゾーン====================================================================================================================
 	#=====================================================================================================================================
@@ -236,13 +581,33 @@ if __name__ == "__main__":
 	C_N  =      2.1 # 法線力係数 ND
 	x_CP =     6600 # ノーズからの風圧中心位置 mm
 	
-	savefig_flag = True # 出力を保存するかどうか
-	savepdf_flag = True # PDF出力するかどうか
+	envelope_flag = False # 全時刻の荷重を計算して包絡線をとるかどうか（Falseは評定時刻のみ）
+	trajectory_file = None # 軌道ファイル(CSV, npy, バイナリ)、指定すると包絡線をファイルの時刻歴で計算する
+	aero_table_A = None # 軸力係数分布dC_A/dxのテーブル(CSV, npz)、指定するとC_Aの集中荷重の代わりに使う
+	aero_table_N = None # 法線力係数分布dC_N/dxのテーブル、指定するとC_N, x_CPの2点集中荷重の代わりに使う
+	aero_mach  = 0.0 # テーブルを引く各秒のマッハ数（配列またはスカラー、軌道ファイルの時刻歴ではファイルの値）
+	aero_alpha = 0.0 # テーブルを引く各秒の迎角 rad
+	load_dtype = np.float64 # 荷重分布を保存する型、np.float32でメモリ半分
+	grid_dx            = 1    # 節点間隔 mm（10 mm程度でも評定荷重はほぼ変わらない）
+	grid_dx_min        = None # 分割点・荷重点付近の節点間隔 mm（Noneは一様格子）
+	grid_cluster_width = 0    # 節点を細かくする分割点・荷重点の前後の範囲 mm
+	dispersion_flag    = False # 分散解析（モンテカルロ）をするかどうか
+	num_case           = 2000  # 分散解析のケース数
+	dispersion_workers = 4     # 分散解析の並列プロセス数
+	dispersion = {"C_A":     (C_A,  0.05*C_A), # 名前: (平均, 標準偏差)
+				  "C_N":     (C_N,  0.10*C_N),
+				  "x_CP":    (x_CP, 200),
+				  "q_scale": (1.0,  0.05),
+				  "gust":    (0.0,  0.10*C_N),
+				  "gimbal":  (0.0,  max_gimbal_angle/3)}
+	memory_report_flag = False # 荷重配列のメモリ使用量とピークを出力するかどうか（tracemallocで計算が遅くなる）
+	savefig_flag = False # 図(PNG)を保存するかどうか
+	savepdf_flag = False # 図をまとめたPDFを保存するかどうか
+	plot_background_flag = True # 図を別プロセスで作るかどうか（Falseは計算の最後に作り終わるまで待つ）
 	save_name = u"ZERO_Ph6F_NP_Case1"
+	result_file = save_name + u"_result" # 計算結果の保存先（配列ごとの.npyのディレクトリ、.npzにすると1ファイル）、Noneは保存しない
 	
-	if(savepdf_flag):pdf = PdfPages(save_name + u"_plot.pdf")
-	sys.stdout = sys.__stdout__
-	
+	if(memory_report_flag):memory = PeakMemory().start()
 	print(u"コンポーネント設定開始")
 	# === コンポーネント ====
 	# comp        = Component(length_mm, weight_kg, prop_init_kg, prop_end_kg, burntime_sec, press_MPa)
@@ -259,20 +624,16 @@ if __name__ == "__main__":
 	
 	# === 曲げモーメントの曲線フィッティング ===
 	fitting_flag = False # 関数フィッティングするかどうか
-	## x1~6 : 集中荷重を受ける機体頭からの距離 mm
-	#x1 = 0
-	#x2 = 1096
-	#x3 = 3497
-	#x4 = 5605
-	#x5 = 6105
-	#x6 = 8905
-	#x_end = 9884
+	fitting_points    = None # 集中荷重を受ける位置のリスト [x1, ..., x6] mm、Noneは誤差が最小になる位置を自動で探す
+	fitting_num_point = 6    # 自動で探すときの集中荷重の数
+	## 集中荷重を受ける機体頭からの距離 mm の例
+	#fitting_points = [0, 1096, 3497, 5605, 6105, 8905]
 	# ==== 入力ここまで =====================================================================================================================
 	#=====================================================================================================================================
 	#=====================================================================================================================================
 
 	# === コンポーネントをRocketクラスにAdd ====
-	rocket = Rocket(burntime, dia)
+	rocket = Rocket(burntime, dia, grid_dx, grid_dx_min, grid_cluster_width)
 	rocket.add_component(nose)
 	rocket.add_component(tank_2nd_LOx)
 	rocket.add_component(tank_2nd_inter)
@@ -287,6 +648,8 @@ if __name__ == "__main__":
 	rocket.set_x_CP(x_CP)
 	rocket.set_C_A(C_A)
 	rocket.set_C_N(C_N,nose,fin,engine)
+	if(aero_table_A is not None or aero_table_N is not None):
+		rocket.set_aero_table(aero_table_A, aero_table_N, aero_mach, aero_alpha)
 	
 	rocket.finalize()
 	
@@ -302,197 +665,72 @@ if __name__ == "__main__":
 	thrust_a = thrust_f(time_a)
 	q_a      = q_f(time_a)
 	
-	#  ==== 重量分布のプロット ====
-	plt.figure(1)
-	for (i, time) in enumerate(rating_time):
-		plt.plot(range(rocket.length+1),rocket.dmdx[time], label= "%s" % (rating_label[i]))
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.1)
-	plt.xlabel("STA mm")
-	plt.ylabel("mass distribution kg/mm")
-	plt.title("mass distribution")
-	plt.legend(loc="best")
-	if(savefig_flag):plt.savefig(save_name + "_load_calculation_mass distribution.png")
-	if(savepdf_flag):pdf.savefig()
-	
-	# ==== 軸力係数＆法線力係数のプロット =====
-	time_force = 0
-	plt.figure(2)
-	plt.plot(range(rocket.length+1),rocket.dC_Adx[time_force], linewidth=5)
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	plt.xlabel("STA [mm]")
-	plt.ylabel("dC_A/dx [kg/mm]")
-	plt.xlim([-100, rocket.length+100])
-	plt.title(r"$\frac{dC_A}{dx}$")
-	if(savefig_flag):plt.savefig(save_name + "_load_calculation_dCAdx.png")
-	if(savepdf_flag):pdf.savefig()
-	
-	plt.figure(3)
-	plt.plot(range(rocket.length+1),rocket.dC_Ndx[time_force], linewidth=5)
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	plt.xlabel("STA [mm]")
-	plt.ylabel("dC_N/dx [kg/mm]")
-	plt.xlim([-100, rocket.length+100])
-	plt.title(r"$\frac{dC_N}{dx}$")
-	if(savefig_flag):plt.savefig(save_name + "_load_calculation_dCNdx.png")
-	if(savepdf_flag):pdf.savefig()
-	print(u"入力値出力終了")
-	
 	# ==== 軸力 ====
 	print(u"軸力計算中...")
-	[X_dotdot,drag,force_A] = calc_axial_load(rocket,thrust_a,q_a,rating_time)
+	[X_dotdot,drag,force_A] = calc_axial_load(rocket,thrust_a,q_a,rating_time,load_dtype)
+	X_dotdot_a = X_dotdot[rating_time]
 	print(u"軸力計算終了")
-
-	print(u"軸力出力開始")
-	plt.figure(4)
-	X_dotdot_a =[]
-	for (i, time) in enumerate(rating_time):
-		plt.plot(range(rocket.length+1),force_A[time], label = "%s" % (rating_label[i]))
-		X_dotdot_a.append(X_dotdot[time])
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	plt.xlabel("STA mm")
-	plt.ylabel("Axial load N")
-	plt.ylim(ymin=-18000)
-	plt.title("Axial load")
-	plt.legend(loc="best")
-	if(savefig_flag):plt.savefig(save_name + "_load_calculation_axial_load.png")
-	if(savepdf_flag):pdf.savefig()
-	print(u"軸力出力終了")
 	
 	# ==== 曲げモーメント ====
 	print(u"曲げモーメント計算中...")
-	[M_a, M_d, M1, M2, M_max, Z_dotdot_d, Z_dotdot_a, Omega_dot_d, Omega_dot_a] = calc_bending_moment(rocket,thrust_a,q_a,rating_time)
+	[M_a, M_d, M1, M2, M_max, Z_dotdot_d, Z_dotdot_a, Omega_dot_d, Omega_dot_a, V_max] = calc_bending_moment(rocket,thrust_a,q_a,T_g_a,rating_time,load_dtype)
+	Z_dotdot_d_a = Z_dotdot_d[rating_time]
+	Z_dotdot_a_a = Z_dotdot_a[rating_time]
 	print(u"曲げモーメント計算終了")
-	
-	# ==== 曲げモーメントのPLOT ====
-	print(u"曲げモーメント出力開始")
-	Z_dotdot_d_a  = []
-	Z_dotdot_a_a  = []
-	Omega_dot_d_a = []
-	Omega_dot_a_a = []
-	for (i, time) in enumerate(rating_time):
-		Z_dotdot_d_a.append(Z_dotdot_d[time])
-		Z_dotdot_a_a.append(Z_dotdot_a[time])
-
-		# 集約表作成
-		plt.figure(5)
-		plt.plot(range(rocket.length+1),M1[time], label="%s" % (rating_label[i]))
-		plt.figure(6)
-		plt.plot(range(rocket.length+1),M2[time], label="%s" % (rating_label[i]))
-		plt.figure(7)
-		plt.plot(range(rocket.length+1),M_max[time], label="%s" % (rating_label[i]))
-
-		# 曲げモーメント内訳
-		plt.figure()
-		#plt.plot(range(rocket.length+1),M_a1[time], label = "Air Force")
-		#plt.plot(range(rocket.length+1),M_a2[time], label = "Air Force Inertia")
-		#plt.plot(range(rocket.length+1),M_d1[time], label = "Gimbal")
-		#plt.plot(range(rocket.length+1),M_d2[time], label = "Gimbal Inertia")
-		plt.plot(range(rocket.length+1),M_a[time],  label = "Air Force")
-		plt.plot(range(rocket.length+1),M_d[time],  label = "Gimbal")
-		plt.axhline(y=0, color = "k", linestyle="--", alpha = 0.2)
-		for j in rocket.divid:
-			plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-		plt.legend(loc = "best")
-		plt.xlabel("STA mm")
-		plt.ylabel("Bending Moment Nm")
-		plt.title("%s Breakdown of BMD" % (rating_label[i]))
-		if(savefig_flag):plt.savefig(save_name + "_load_calculation_bending_moment_%s.png" % (rating_label[i]))
-		if(savepdf_flag):pdf.savefig()
-	
-		if(fitting_flag): # 曲げモーメント曲線のフィッティング
-			fitting_6lines(rocket.x, M1[time], x1, x2, x3, x4, x5, x6, x_end,True, True, True,
-			 			   "%s_M++_%s" % (save_name, rating_label[i]), "%s_M++_%s" % (save_name, rating_label[i]))
-			if(savepdf_flag):pdf.savefig()
-			fitting_6lines(rocket.x, M2[time], x1, x2, x3, x4, x5, x6, x_end,True, False, True,
-			 			   "%s_M+-_%s" % (save_name, rating_label[i]), "%s_M+-_%s" % (save_name, rating_label[i]))
-			if(savepdf_flag):pdf.savefig()
-	
-	plt.figure(5)
-	plt.axhline(y=0, color = "k", linestyle="--", alpha = 0.2)
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	plt.xlabel("STA mm")
-	plt.ylabel("Bending Moment Nm")
-	plt.title("Bending Moment (Airforce + Gimbal)")
-	plt.legend(loc="best")
-	if(savefig_flag):plt.savefig(save_name + u"_load_calculation_BendingMoment_same_sign.png")
-	if(savepdf_flag):pdf.savefig()
-
-	plt.figure(6)
-	plt.axhline(y=0, color = "k", linestyle="--", alpha = 0.2)
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	plt.xlabel("STA mm")
-	plt.ylabel("Bending Moment Nm")
-	plt.title("Bending Moment (Airforce - Gimbal)")
-	plt.legend(loc="best")
-	if(savefig_flag):plt.savefig(save_name + u"_load_calculation_BendingMoment_different_sign.png")
-	if(savepdf_flag):pdf.savefig()
-	
-	plt.figure(7)
-	plt.axhline(y=0, color = "k", linestyle="--", alpha = 0.2)
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	plt.xlabel("STA mm")
-	plt.ylabel("Bending Moment Nm")
-	plt.title("Max Bending Moment(abs)")
-	plt.legend(loc="best")
-	if(savefig_flag):plt.savefig(save_name + u"_load_calculation_BendingMoment_Max.png")
-	if(savepdf_flag):pdf.savefig()
-
-	print(u"曲げモーメント出力終了")
-	
+
+	if(fitting_flag): # 曲げモーメント曲線のフィッティング（図は計算結果からほかの図と一緒に作る）
+		from fitting import fitting_lines, fitting_auto
+		fitting = {"M1": ([], []), "M2": ([], [])} # 荷重名: (集中荷重の位置, 集中荷重) の評定時刻ごとのリスト
+		for (i, time) in enumerate(rating_time):
+			for (key, M, sign, print_flag) in [("M1", M1, "++", True), ("M2", M2, "+-", False)]:
+				name = "%s_M%s_%s" % (save_name, sign, rating_label[i])
+				if(fitting_points is None):
+					(points, P) = fitting_auto(rocket.x, M[time], fitting_num_point, rocket.length, False, print_flag, False, name, name)
+				else:
+					(points, P) = (fitting_points, fitting_lines(rocket.x, M[time], fitting_points, rocket.length, False, print_flag, False, name, name))
+				fitting[key][0].append(points)
+				fitting[key][1].append(P)
 
 	# ==== 等価軸力 ====
 	print(u"等価軸力計算中...")
 	[F_eq_comp, F_eq_tens]=calc_equivalent_axial_force(force_A,M_max,dia)
+	[N_comp, N_tens, q_shear]=calc_running_load(F_eq_comp,F_eq_tens,V_max,dia)
 	print(u"等価軸力計算終了")
 
-	print(u"等価軸力出力開始")
-
-	plt.figure()
-	F_eq_comp_a =[]
-	for (i, time) in enumerate(rating_time):
-		plt.plot(range(rocket.length+1),-F_eq_comp[time], label = "%s" % (rating_label[i]))
-		F_eq_comp_a.append(F_eq_comp[time])
-	for j in rocket.divid:
-		plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	plt.xlabel("STA mm")
-	plt.ylabel("Axial force N")
-	plt.ylim(ymin=0)
-	plt.title("Equivalent Axial Force (Compression)")
-	plt.legend(loc="best")
-	if(savefig_flag):plt.savefig(save_name + "_load_calculation_equivalent_axial_force_compressive.png")
-	if(savepdf_flag):pdf.savefig()
-
-
-	#plt.figure()
-	#F_eq_tens_a =[]
-	#for (i, time) in enumerate(rating_time):
-	#	plt.plot(range(rocket.length+1),F_eq_tens[time], label = "%s" % (rating_label[i]))
-	#	F_eq_tens_a.append(F_eq_tens[time])
-	#for j in rocket.divid:
-	#	plt.axvline(x=j, color = "k", linestyle="--", alpha = 0.2)
-	#plt.xlabel("STA mm")
-	#plt.ylabel("Axial force N")
-	#plt.ylim(ymin=0)
-	#plt.title("Equivalent Axial Force (Tensile)")
-	#plt.legend(loc="best")
-	#if(savefig_flag):plt.savefig(save_name + "_load_calculation_equivalent_axial_force_tensile.png")
-	#if(savepdf_flag):pdf.savefig()
-
-	print(u"等価軸力出力終了")
-
 	# ==== 評定荷重 ====
 	print(u"評定荷重計算中...")
-	force_A_rating   = calc_rating_load(force_A,  rocket.divid,rating_time,-1)
-	M_max_rating     = calc_rating_load(M_max,    rocket.divid,rating_time, 1)
-	F_eq_tens_rating = calc_rating_load(F_eq_tens,rocket.divid,rating_time, 1)
-	F_eq_comp_rating = calc_rating_load(F_eq_comp,rocket.divid,rating_time,-1)
+	rating = rating_loads({"force_A": force_A, "M_max": M_max, "F_eq_comp": F_eq_comp,
+						   "V_max": V_max, "N_comp": N_comp, "q_shear": q_shear},
+						  rocket.divid_index, rating_time,
+						  {"force_A": -1, "M_max": 1, "F_eq_comp": -1, "V_max": 1, "N_comp": -1, "q_shear": 1})
+	force_A_rating   = rating["force_A"].load
+	M_max_rating     = rating["M_max"].load
+	F_eq_comp_rating = rating["F_eq_comp"].load
+	V_max_rating     = rating["V_max"].load
+	N_comp_rating    = rating["N_comp"].load
+	q_shear_rating   = rating["q_shear"].load
+	if(envelope_flag): # 全時刻の包絡線から評定荷重を求める
+		print(u"全時刻の荷重包絡線計算中...")
+		if(trajectory_file is None):
+			envelope = calc_load_envelope(rocket,thrust_a,q_a,T_g_a,dtype=load_dtype)
+		else:
+			envelope = calc_trajectory_envelope(rocket,trajectory_file,dtype=load_dtype)
+		force_A_envelope_rating   = calc_rating_load([envelope["force_A"].min],  rocket.divid_index,[0],-1)
+		M_max_envelope_rating     = calc_rating_load([envelope["M_max"].max],    rocket.divid_index,[0], 1)
+		F_eq_comp_envelope_rating = calc_rating_load([envelope["F_eq_comp"].min],rocket.divid_index,[0],-1)
+		V_max_envelope_rating     = calc_rating_load([envelope["V_max"].max],    rocket.divid_index,[0], 1)
+		print(u"全時刻の荷重包絡線計算終了")
+	if(dispersion_flag): # 分散解析の平均+3σから評定荷重を求める
+		print(u"分散解析中...")
+		from dispersion import sample_cases, run_dispersion, dispersion_envelope
+		cases = sample_cases(num_case, dispersion, seed=0, limit={"gimbal": (-max_gimbal_angle, max_gimbal_angle)})
+		dispersion_stats = run_dispersion(rocket, cases, rating_time, thrust_a[rating_time], q_a[rating_time],
+										  workers=dispersion_workers)
+		M_abs_dispersion     = dispersion_envelope(dispersion_stats, rating_time, "M_abs")
+		F_eq_comp_dispersion = dispersion_envelope(dispersion_stats, rating_time, "F_eq_comp")
+		M_max_dispersion_rating     = calc_rating_load([M_abs_dispersion["upper"]],    rocket.divid_index,[0], 1)
+		F_eq_comp_dispersion_rating = calc_rating_load([F_eq_comp_dispersion["lower"]],rocket.divid_index,[0],-1)
+		print(u"分散解析終了")
 	print(u"評定荷重計算終了")
 
 	print(u"評定荷重出力開始")
@@ -503,61 +741,154 @@ if __name__ == "__main__":
 	fp.write("終了位置[mm],"       + ",".join(map(str,rocket_divid_sta[1:]))+"\n")
 	fp.write("軸力[N],"            + ",".join(map(str,force_A_rating))+"\n")
 	fp.write("曲げモーメント[Nm]," + ",".join(map(str,M_max_rating))+"\n")
-	#fp.write("等価軸引張力[N],"    + ",".join(map(str,F_eq_tens_rating))+"\n")
 	fp.write("等価軸圧縮力[N],"    + ",".join(map(str,F_eq_comp_rating))+"\n")
+	fp.write("せん断力[N],"        + ",".join(map(str,V_max_rating))+"\n")
+	fp.write("軸方向線荷重（圧縮）[N/mm]," + ",".join(map(str,N_comp_rating))+"\n")
+	fp.write("せん断流[N/mm],"     + ",".join(map(str,q_shear_rating))+"\n")
+	if(envelope_flag):
+		fp.write("軸力（全時刻包絡）[N],"            + ",".join(map(str,force_A_envelope_rating))+"\n")
+		fp.write("曲げモーメント（全時刻包絡）[Nm]," + ",".join(map(str,M_max_envelope_rating))+"\n")
+		fp.write("等価軸圧縮力（全時刻包絡）[N],"    + ",".join(map(str,F_eq_comp_envelope_rating))+"\n")
+		fp.write("せん断力（全時刻包絡）[N],"        + ",".join(map(str,V_max_envelope_rating))+"\n")
+	if(dispersion_flag):
+		fp.write("曲げモーメント（分散解析 平均+3σ）[Nm]," + ",".join(map(str,M_max_dispersion_rating))+"\n")
+		fp.write("等価軸圧縮力（分散解析 平均-3σ）[N],"    + ",".join(map(str,F_eq_comp_dispersion_rating))+"\n")
 	fp.close()
 
 	print(u"評定荷重出力終了")
 
-	# ==== 後処理====
-	# plt.show()
-	
-	if(savepdf_flag):pdf.close()
+	# ==== 計算結果の保存（後段の計算用） ====
+	if(result_file is not None):
+		print(u"計算結果保存中...")
+		arrays = {"x": rocket.x, "divid": rocket.divid, "divid_index": rocket.divid_index, "rating_time": rating_time,
+				  "mass": rocket.mass, "x_CG": rocket.x_CG, "x_CP": rocket.x_CP, "inertia": rocket.inertia,
+				  "thrust": thrust_a, "q": q_a, "T_g": T_g_a,
+				  "X_dotdot": X_dotdot[rating_time], "Z_dotdot_a": Z_dotdot_a[rating_time], "Z_dotdot_d": Z_dotdot_d[rating_time],
+				  "Omega_dot_a": Omega_dot_a[rating_time], "Omega_dot_d": Omega_dot_d[rating_time],
+				  "dmdx": rocket.dmdx[rating_time], "dC_Adx": rocket.dC_Adx[rating_time], "dC_Ndx": rocket.dC_Ndx[rating_time]}
+		if(rocket.x_CP_table is not None):
+			arrays["x_CP_table"] = rocket.x_CP_table
+		distributions = {"drag": drag, "force_A": force_A, "M_a": M_a, "M_d": M_d, "M1": M1, "M2": M2, "M_max": M_max,
+						 "V_max": V_max, "F_eq_comp": F_eq_comp, "F_eq_tens": F_eq_tens, "N_comp": N_comp, "N_tens": N_tens, "q_shear": q_shear}
+		for (name, value) in distributions.items(): # 評定時刻の分布 (評定時刻, 節点)
+			arrays[name] = value[rating_time]
+		for (name, value) in rating.items():
+			arrays["rating.%s.load" % name]    = value.load
+			arrays["rating.%s.station" % name] = value.station
+			arrays["rating.%s.time" % name]    = value.time
+		if(envelope_flag):
+			for (name, value) in envelope.items():
+				for field in ["max", "min", "time_max", "time_min"]:
+					arrays["envelope.%s.%s" % (name, field)] = getattr(value, field)
+		if(fitting_flag):
+			for (name, (points, P)) in fitting.items():
+				arrays["fitting.%s.points" % name] = points
+				arrays["fitting.%s.P" % name]      = P
+		if(dispersion_flag):
+			arrays["dispersion.M_abs.upper"]     = M_abs_dispersion["upper"]
+			arrays["dispersion.F_eq_comp.lower"] = F_eq_comp_dispersion["lower"]
+		units = {"x": "mm", "divid": "mm", "rating_time": "s", "mass": "kg", "x_CG": "mm", "x_CP": "mm", "x_CP_table": "mm", "inertia": "kg mm2",
+				 "thrust": "N", "q": "Pa", "T_g": "N", "X_dotdot": "m/s2", "Z_dotdot_a": "m/s2", "Z_dotdot_d": "m/s2",
+				 "Omega_dot_a": "m/mm/s2", "Omega_dot_d": "m/mm/s2", "dmdx": "kg", "dC_Adx": "-", "dC_Ndx": "-",
+				 "drag": "N", "force_A": "N", "M_a": "Nm", "M_d": "Nm", "M1": "Nm", "M2": "Nm", "M_max": "Nm", "V_max": "N",
+				 "F_eq_comp": "N", "F_eq_tens": "N", "N_comp": "N/mm", "N_tens": "N/mm", "q_shear": "N/mm",
+				 "fitting.M1.points": "mm", "fitting.M1.P": "N", "fitting.M2.points": "mm", "fitting.M2.P": "N"}
+		meta = {"name": save_name, "created": tm.strftime("%Y-%m-%d %H:%M:%S"), "units": units,
+				"rating_label": rating_label, "diameter": dia, "burntime": burntime,
+				"C_A": C_A, "C_N": C_N, "max_gimbal_angle": max_gimbal_angle,
+				"grid": {"dx": grid_dx, "dx_min": grid_dx_min, "cluster_width": grid_cluster_width},
+				"trajectory_file": trajectory_file, "envelope": envelope_flag, "dispersion": dispersion_flag}
+		save_result(result_file, arrays, meta)
+		print(u"計算結果保存終了")
+
+	# ==== 図の作成 ====
+	# 保存した計算結果から作る（計算結果を保存しない場合は作らない）
+	if((savefig_flag or savepdf_flag) and result_file is not None):
+		from load_plot import render, render_background # 図を作るときだけmatplotlibを読み込む
+		if(plot_background_flag):
+			print(u"図の作成を別プロセスで開始")
+			render_background(result_file, save_name, savefig_flag, savepdf_flag)
+		else:
+			print(u"図の作成中...")
+			render(result_file, save_name, savefig_flag, savepdf_flag)
+			print(u"図の作成終了")
 	
 	print(u"処理時間:%.1f sec" % (tm.time() - process_start))
+	if(memory_report_flag):
+		memory.stop()
+		arrays = {"dmdx": rocket.dmdx, "dC_Adx": rocket.dC_Adx, "dC_Ndx": rocket.dC_Ndx,
+				  "drag": drag, "force_A": force_A, "M_a": M_a, "M_d": M_d, "M1": M1, "M2": M2, "M_max": M_max,
+				  "F_eq_comp": F_eq_comp, "F_eq_tens": F_eq_tens, "V_max": V_max, "N_comp": N_comp, "N_tens": N_tens, "q_shear": q_shear}
+		if(envelope_flag):arrays["envelope"] = [[v.max, v.min, v.time_max, v.time_min] for v in envelope.values()]
+		table, total = footprint(arrays)
+		dense = rocket.burntime * len(rocket.x) * 8
+		print(u"荷重配列のメモリ:%s（密な配列1つ %s）、計算中のピーク:%s" % (format_bytes(total), format_bytes(dense), format_bytes(memory.peak)))
+		for (name, nbytes) in table.items():
+			print(u"  %s :\t%s" % (name, format_bytes(nbytes)))
 	
 	# ==== 文字出力 ====
-	sys.stdout = open(save_name + u"_output.txt", "w") # 出力先をファイルに変更
-	print(u"==== 結果出力 ====")
-	print(u"★ 入力値")
-	print(u"機体直径 = %d mm,\t機体断面積 = %.3f m2" % (dia*1e3, rocket.area))
-	print(u"燃焼時間 = %d 秒" % (burntime))
+	fo = open(save_name + u"_output.txt", "w")
+	print(u"==== 結果出力 ====", file=fo)
+	print(u"★ 入力値", file=fo)
+	print(u"機体直径 = %d mm,\t機体断面積 = %.3f m2" % (dia*1e3, rocket.area), file=fo)
+	print(u"燃焼時間 = %d 秒" % (burntime), file=fo)
 	# print(u"")
-	print(u"凡例 :\t\t\t[LiftOff, MaxQ, MaxDrag, MECO]")
-	print(u"時刻 :\t\t\t[%d sec, %d sec, %d sec, %d sec]" % (rating_time[0], rating_time[1], rating_time[2], rating_time[3]))
-	print(u"動圧 :\t\t\t[%.1f Pa, %.1f Pa, %.1f Pa, %.1f Pa]" % (q[0], q[1], q[2], q[3]))
-	print(u"推力 :\t\t\t[%.1f N, %.1f N, %.1f N, %.1f N]" % (thrust[0], thrust[1], thrust[2], thrust[3]))
-	print(u"ジンバル横推力 :\t[%.1f N, %.1f N, %.1f N, %.1f N]" % (T_g[0], T_g[1], T_g[2], T_g[3]))
-	print(u"軸力係数C_A :\t\t[%.1f , %.1f , %.1f , %.1f ]" % (C_A, C_A, C_A, C_A))
-	print(u"法線力係数C_N :\t\t[%.1f , %.1f , %.1f , %.1f ]" % (C_N, C_N, C_N, C_N))
-	print(u"風圧中心x_CP :\t\t[%.1f mm, %.1f mm, %.1f mm, %.1f mm]" % (rocket.x_CP[rating_time[0]], rocket.x_CP[rating_time[1]], rocket.x_CP[rating_time[2]], rocket.x_CP[rating_time[3]]))
-	print(u"重心x_CG（参考） :\t[%.1f mm, %.1f mm, %.1f mm, %.1f mm]" % (rocket.x_CG[rating_time[0]], rocket.x_CG[rating_time[1]], rocket.x_CG[rating_time[2]], rocket.x_CG[rating_time[3]]))
-	print(u"分割点[mm] :\t\t", end="")
-	print(rocket.divid)
-	print(u"")
-	print(u"★ 計算結果")
-	print(u"軸方向加速度 :\t\t\t[%.1f m/s2, %.1f m/s2, %.1f m/s2, %.1f m/s2]" % (X_dotdot_a[0], X_dotdot_a[1], X_dotdot_a[2], X_dotdot_a[3]))
-	print(u"垂直方向加速度（空気力） :\t[%.1f m/s2, %.1f m/s2, %.1f m/s2, %.1f m/s2]" %   (Z_dotdot_a_a[0], Z_dotdot_a_a[1], Z_dotdot_a_a[2], Z_dotdot_a_a[3]))
-	print(u"垂直方向加速度（ジンバル） :\t[%.1f m/s2, %.1f m/s2, %.1f m/s2, %.1f m/s2]" % (Z_dotdot_d_a[0], Z_dotdot_d_a[1], Z_dotdot_d_a[2], Z_dotdot_d_a[3]))
-	print(u"")
-	print(u"==== コンポーネント ====")
-	print(u"[長さ mm,\tドライ重量 kg,\t推進剤重量 kg,\t推進剤空時 kg]")
-	print(u"fairing :\t", end="")
-	nose.show()
-	print(u"2nd_LOx_tank :\t", end="")
-	tank_2nd_LOx.show()
-	print(u"2nd_fuel_tank :\t", end="")
-	tank_2nd_fuel.show()
-	print(u"1st_LOx_tank :\t", end="")
-	tank_1st_LOx.show()
-	print(u"1st_fuel_tank :\t", end="")
-	tank_1st_fuel.show()
-	print(u"fin :\t", end="")
-	fin.show()
-	print(u"engine :\t", end="")
-	engine.show()
+	print(u"凡例 :\t\t\t[LiftOff, MaxQ, MaxDrag, MECO]", file=fo)
+	print(u"時刻 :\t\t\t[%d sec, %d sec, %d sec, %d sec]" % (rating_time[0], rating_time[1], rating_time[2], rating_time[3]), file=fo)
+	print(u"動圧 :\t\t\t[%.1f Pa, %.1f Pa, %.1f Pa, %.1f Pa]" % (q[0], q[1], q[2], q[3]), file=fo)
+	print(u"推力 :\t\t\t[%.1f N, %.1f N, %.1f N, %.1f N]" % (thrust[0], thrust[1], thrust[2], thrust[3]), file=fo)
+	print(u"ジンバル横推力 :\t[%.1f N, %.1f N, %.1f N, %.1f N]" % (T_g[0], T_g[1], T_g[2], T_g[3]), file=fo)
+	print(u"軸力係数C_A :\t\t[%.1f , %.1f , %.1f , %.1f ]" % (C_A, C_A, C_A, C_A), file=fo)
+	print(u"法線力係数C_N :\t\t[%.1f , %.1f , %.1f , %.1f ]" % (C_N, C_N, C_N, C_N), file=fo)
+	x_CP_a = rocket.x_CP if rocket.x_CP_table is None else rocket.x_CP_table # テーブルがあれば分布の図心
+	print(u"風圧中心x_CP :\t\t[%.1f mm, %.1f mm, %.1f mm, %.1f mm]" % (x_CP_a[rating_time[0]], x_CP_a[rating_time[1]], x_CP_a[rating_time[2]], x_CP_a[rating_time[3]]), file=fo)
+	print(u"重心x_CG（参考） :\t[%.1f mm, %.1f mm, %.1f mm, %.1f mm]" % (rocket.x_CG[rating_time[0]], rocket.x_CG[rating_time[1]], rocket.x_CG[rating_time[2]], rocket.x_CG[rating_time[3]]), file=fo)
+	print(u"分割点[mm] :\t\t", end="", file=fo)
+	print(rocket.divid, file=fo)
+	print(u"", file=fo)
+	print(u"★ 計算結果", file=fo)
+	print(u"軸方向加速度 :\t\t\t[%.1f m/s2, %.1f m/s2, %.1f m/s2, %.1f m/s2]" % (X_dotdot_a[0], X_dotdot_a[1], X_dotdot_a[2], X_dotdot_a[3]), file=fo)
+	print(u"垂直方向加速度（空気力） :\t[%.1f m/s2, %.1f m/s2, %.1f m/s2, %.1f m/s2]" %   (Z_dotdot_a_a[0], Z_dotdot_a_a[1], Z_dotdot_a_a[2], Z_dotdot_a_a[3]), file=fo)
+	print(u"垂直方向加速度（ジンバル） :\t[%.1f m/s2, %.1f m/s2, %.1f m/s2, %.1f m/s2]" % (Z_dotdot_d_a[0], Z_dotdot_d_a[1], Z_dotdot_d_a[2], Z_dotdot_d_a[3]), file=fo)
+	print(u"★ 評定荷重の位置と時刻（区間ごと）", file=fo)
+	station_x = lambda station: rocket.x[station] if station >= 0 else np.nan # 正の荷重がない区間(station=-1)はnan
+	for i in range(len(rocket.divid)-1):
+		print(u"%d - %d mm :\t曲げモーメント %.1f Nm @ %.0f mm, %g sec,\t等価軸圧縮力 %.1f N @ %.0f mm, %g sec" %
+			  (rocket.divid[i], rocket.divid[i+1],
+			   rating["M_max"].load[i],     station_x(rating["M_max"].station[i]),     rating["M_max"].time[i],
+			   rating["F_eq_comp"].load[i], station_x(rating["F_eq_comp"].station[i]), rating["F_eq_comp"].time[i]), file=fo)
+	print(u"★ 評定荷重の線荷重（区間ごと）", file=fo)
+	for i in range(len(rocket.divid)-1):
+		print(u"%d - %d mm :\tせん断力 %.1f N,\t軸方向線荷重（圧縮） %.2f N/mm,\tせん断流 %.2f N/mm" %
+			  (rocket.divid[i], rocket.divid[i+1], V_max_rating[i], N_comp_rating[i], q_shear_rating[i]), file=fo)
+	if(envelope_flag):
+		print(u"★ 全時刻包絡線（区間ごとの最大曲げモーメントと時刻）", file=fo)
+		for i in range(len(rocket.divid)-1):
+			i_start = rocket.divid_index[i]
+			i_end   = rocket.divid_index[i+1]+1
+			pos = i_start + np.argmax(envelope["M_max"].max[i_start:i_end])
+			print(u"%d - %d mm :\t%.1f Nm @ %g sec" % (rocket.divid[i], rocket.divid[i+1], envelope["M_max"].max[pos], envelope["M_max"].time_max[pos]), file=fo)
+	print(u"", file=fo)
+	print(u"==== コンポーネント ====", file=fo)
+	print(u"[長さ mm,\tドライ重量 kg,\t推進剤重量 kg,\t推進剤空時 kg]", file=fo)
+	print(u"fairing :\t", end="", file=fo)
+	nose.show(fo)
+	print(u"2nd_LOx_tank :\t", end="", file=fo)
+	tank_2nd_LOx.show(fo)
+	print(u"2nd_fuel_tank :\t", end="", file=fo)
+	tank_2nd_fuel.show(fo)
+	print(u"1st_LOx_tank :\t", end="", file=fo)
+	tank_1st_LOx.show(fo)
+	print(u"1st_fuel_tank :\t", end="", file=fo)
+	tank_1st_fuel.show(fo)
+	print(u"fin :\t", end="", file=fo)
+	fin.show(fo)
+	print(u"engine :\t", end="", file=fo)
+	engine.show(fo)
 	
 	# 一端ファイルに出力させたものを標準出力に呼び出している
-	sys.stdout.close()
-	sys.stdout = sys.__stdout__
+	fo.close()
 	print(open(save_name + u"_output.txt","r").read())
+
+if __name__ == "__main__":
+	main()
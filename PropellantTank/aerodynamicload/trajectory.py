@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# 軌道計算結果（時刻歴）の読み込み
+# 6自由度計算の出力のような長い時刻歴を、ファイル全体をメモリに載せずにchunk_size行ずつ読み出す。
+# 各チャンクはFIELDSの列を持つ構造化配列で、荷重計算(calc_trajectory_envelope)にそのまま渡せる。
+#
+# 対応形式
+# CSV  : 1行目が列名のヘッダ（FIELDSの名前、順不同、余分な列は無視）、区切りは","
+# .npy : FIELDSの列を持つ構造化配列、または(行数, 7)の実数配列（列順はFIELDS）、mmapで読む
+# その他の拡張子 : float64でFIELDSの順に並べたヘッダなしのバイナリ
+#
+# 列（単位）
+# time[s], thrust[N], q[Pa], mach[-], alpha[rad], gimbal[rad], x_CP[mm]
+# mach, alpha, x_CPは省略可（nan）。x_CPがnanの時刻は機体に設定した風圧中心位置を使う。
+import io
+import itertools
+import numpy as np
+
+FIELDS = ["time", "thrust", "q", "mach", "alpha", "gimbal", "x_CP"]
+REQUIRED = ["time", "thrust", "q", "gimbal"]
+DTYPE = np.dtype([(name, np.float64) for name in FIELDS])
+
+def _to_chunk(columns, values):
+	# 列名columnsの2次元配列valuesをDTYPEの構造化配列にする
+	chunk = np.full(len(values), np.nan, dtype=DTYPE)
+	for (j, name) in enumerate(columns):
+		if name in FIELDS:
+			chunk[name] = values[:, j]
+	return chunk
+
+def read_csv(path, chunk_size=10000, delimiter=","):
+	with io.open(path, "r", encoding="utf-8-sig") as f:
+		columns = [v.strip() for v in f.readline().split(delimiter)]
+		missing = [name for name in REQUIRED if name not in columns]
+		if missing:
+			raise ValueError(u"軌道ファイルに必要な列がありません: %s (%s)" % (", ".join(missing), path))
+		while True:
+			lines = list(itertools.islice(f, chunk_size))
+			if not lines:
+				break
+			values = np.loadtxt(lines, delimiter=delimiter, ndmin=2)
+			yield _to_chunk(columns, values)
+
+def read_npy(path, chunk_size=10000):
+	data = np.load(path, mmap_mode="r")
+	if data.dtype.names is not None:
+		missing = [name for name in REQUIRED if name not in data.dtype.names]
+		if missing:
+			raise ValueError(u"軌道ファイルに必要な列がありません: %s (%s)" % (", ".join(missing), path))
+		for start in range(0, len(data), chunk_size):
+			block = data[start:start+chunk_size]
+			chunk = np.full(len(block), np.nan, dtype=DTYPE)
+			for name in FIELDS:
+				if name in data.dtype.names:
+					chunk[name] = block[name]
+			yield chunk
+	else:
+		for start in range(0, len(data), chunk_size):
+			yield _to_chunk(FIELDS, np.asarray(data[start:start+chunk_size], dtype=np.float64))
+
+def read_binary(path, chunk_size=10000):
+	with io.open(path, "rb") as f:
+		while True:
+			chunk = np.fromfile(f, dtype=DTYPE, count=chunk_size)
+			if len(chunk) == 0:
+				break
+			yield chunk
+
+def read_trajectory(path, chunk_size=10000):
+	# 拡張子で形式を判定してチャンクを順に返すジェネレータ
+	if path.lower().endswith((".csv", ".txt")):
+		return read_csv(path, chunk_size)
+	if path.lower().endswith(".npy"):
+		return read_npy(path, chunk_size)
+	return read_binary(path, chunk_size)
+
+def write_binary(path, chunks):
+	# チャンク（またはDTYPEの構造化配列1つ）をヘッダなしバイナリに書き出す（CSVの変換用）
+	if isinstance(chunks, np.ndarray):
+		chunks = [chunks]
+	with io.open(path, "wb") as f:
+		for chunk in chunks:
+			np.asarray(chunk, dtype=DTYPE).tofile(f)
+
+def load_trajectory(path, chunk_size=10000):
+	# ファイル全体を1つの構造化配列として読む（LoadModelなど全時刻を使う場合）
+	chunks = list(read_trajectory(path, chunk_size))
+	return np.concatenate(chunks) if chunks else np.zeros(0, dtype=DTYPE)
+
+def make_trajectory(time, thrust, q, gimbal, mach=np.nan, alpha=np.nan, x_CP=np.nan):
+	# 配列（またはスカラー）から軌道の構造化配列を作る
+	time = np.atleast_1d(np.asarray(time, dtype=np.float64))
+	data = np.zeros(len(time), dtype=DTYPE)
+	for (name, value) in zip(FIELDS, [time, thrust, q, mach, alpha, gimbal, x_CP]):
+		data[name] = value
+	return data
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+補強円筒の組み合わせ荷重（軸力＋曲げ＋せん断＋内圧）に対する相関式の判定
+
+複数の荷重ケース(N, M, V, p)と複数の設計を配列のままブロードキャストして、
+パネル（外板）とストリンガの安全余裕を一括で求め、設計ごとに支配的な荷重ケースを選ぶ。
+
+    圧縮応力   fc = (N + 4|M|/D) / A - p*π*R**2 / A  （P=4|M|/D、曲げの符号によらず圧縮側の縁、内圧による軸引張で軽減）
+    せん断応力 fs = V / (π*R) / t                     （薄肉円筒の最大せん断流）
+    外板     : Rc + Rs**2 = 1、MS = 2 / (Rc + sqrt(Rc**2 + 4*Rs**2)) - 1   （Bruhn本C9曲面パネル）
+    ストリンガ: MS = 1 / Rc - 1
+
+外板の座屈応力には内圧による座屈応力の増分 ΔFcr = Δγ*E*t/R を加えられる。
+Δγは NASA SP-8007 Fig.6 を目視で関数化したもの（横軸 (p/E)*(R/t)**2）。
+外板のせん断座屈応力は平板（長いパネル、4辺単純支持 Ks=5.35）の値で、曲率の効果は無視する。
+"""
+
+from collections import namedtuple
+import numpy as np
+from scipy import interpolate
+
+#NASA SP-8007 Fig.6を目視で関数化
+fig_sp8007_6 = [[0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10],
+                [0, 0.02, 0.035, 0.06, 0.09, 0.13, 0.18, 0.21, 0.23, 0.24, 0.24]]
+function_pressure = interpolate.interp1d(fig_sp8007_6[0], fig_sp8007_6[1],
+                                         bounds_error=False, fill_value=(0.0, 0.24))
+
+KS_SHEAR = 5.35
+
+InteractionResult = namedtuple("InteractionResult",
+                               ["margin_panel", "margin_stringer", "margin",
+                                "governing_panel", "governing_stringer", "governing",
+                                "stress_compression", "stress_shear"])
+
+
+def pressure_stabilization(pressure, modulus_Young, thickness, radius):
+    """内圧による円筒外板の座屈応力の増分 [MPa]
+    Args:
+        pressure (np.array) : 内圧 [MPa]
+        modulus_Young (float) : ヤング率 [GPa]
+        thickness (np.array) : 外板肉厚 [mm]
+        radius (float) : 半径 [mm]
+    """
+    E = modulus_Young * 1e3
+    p_bar = np.maximum(pressure, 0.0) / E * (radius / thickness)**2
+    return function_pressure(p_bar) * E * thickness / radius
+
+
+def shear_buckling_stress(modulus_Young, ratio_Poisson, thickness, width):
+    """外板のせん断座屈応力 [MPa]（平板、Ks=5.35）"""
+    return KS_SHEAR * np.pi**2 * modulus_Young * 1e3 / (12 * (1 - ratio_Poisson**2)) * (thickness / width)**2
+
+
+def interaction_margins(N, M, V, p, diameter, num_stringer,
+                        t_panel, area_panel, Fcr_panel, area_stringer, Fcr_stringer,
+                        modulus_Young_skin, ratio_Poisson_skin,
+                        safety_factor_panel=1.0, safety_factor_stringer=1.0,
+                        stabilization=True):
+    """全荷重ケース×全設計の安全余裕を求める
+    荷重ケースは1次元配列で与え、結果の先頭の軸が荷重ケース、残りの軸が設計配列の形状になる。
+    Args:
+        N (np.array) : 軸圧縮力 [N]（圧縮が正）
+        M (np.array) : 曲げモーメント [N*m]（符号付きでよい、絶対値で評価する）
+        V (np.array) : せん断力 [N]
+        p (np.array) : 内圧 [MPa]
+        diameter (float) : 外径 [mm]
+        num_stringer (float) : ストリンガ本数（パネル枚数）
+        t_panel, area_panel, Fcr_panel (np.array) : パネル肉厚[mm]、パネル1枚の断面積[mm2]、座屈応力[MPa]
+        area_stringer, Fcr_stringer (np.array) : ストリンガ断面積[mm2]、座屈応力[MPa]
+        modulus_Young_skin (float) : 外板ヤング率 [GPa]
+        ratio_Poisson_skin (float) : 外板ポアソン比
+        safety_factor_panel, safety_factor_stringer (float, optional) : 荷重にかける安全率
+        stabilization (bool, optional) : 内圧による外板座屈応力の増分を考慮するか
+    Returns:
+        InteractionResult : 安全余裕（荷重ケース×設計）、設計ごとに支配的な荷重ケースの番号、
+                            圧縮応力[MPa]、せん断応力[MPa]
+    """
+    design = np.broadcast(t_panel, area_panel, Fcr_panel, area_stringer, Fcr_stringer)
+    case_shape = (-1,) + (1,) * design.ndim
+    N, M, V, p = [np.asarray(v, dtype=float).reshape(case_shape) for v in np.broadcast_arrays(N, M, V, p)]
+
+    radius = diameter / 2
+    width = np.pi * diameter / num_stringer
+    area = num_stringer * (np.asarray(area_panel) + area_stringer)
+    stress_compression = (N + 4 * np.abs(M) * 1e3 / diameter) / area - p * np.pi * radius**2 / area
+    stress_shear = np.abs(V) / (np.pi * radius) / t_panel
+
+    Fcr_skin = Fcr_panel + (pressure_stabilization(p, modulus_Young_skin, t_panel, radius) if stabilization else 0.0)
+    Fs_skin = shear_buckling_stress(modulus_Young_skin, ratio_Poisson_skin, t_panel, width)
+
+    R_c = np.maximum(stress_compression, 0.0) * safety_factor_panel / Fcr_skin
+    R_s = stress_shear * safety_factor_panel / Fs_skin
+    with np.errstate(divide="ignore"):
+        margin_panel = 2 / (R_c + np.sqrt(R_c**2 + 4 * R_s**2)) - 1
+        margin_stringer = 1 / (np.maximum(stress_compression, 0.0) * safety_factor_stringer / Fcr_stringer) - 1
+    margin = np.minimum(margin_panel, margin_stringer)
+
+    return InteractionResult(margin_panel, margin_stringer, margin,
+                             np.argmin(margin_panel, axis=0), np.argmin(margin_stringer, axis=0),
+                             np.argmin(margin, axis=0), stress_compression, stress_shear)
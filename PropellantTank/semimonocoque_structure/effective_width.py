@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+補強パネルの座屈後強度（有効幅法）
+
+外板が座屈した後もストリンガ近傍の有効幅 be だけは荷重を受け持つとして、
+ストリンガ＋有効幅外板の組み合わせ断面の柱強度からパネルの破壊応力を求める。
+有効幅はストリンガ応力に依存し、ストリンガ応力は組み合わせ断面の柱強度に依存するので、
+設計グリッド全体に対して配列のまま固定点反復で解く（Bruhn本C7.13、C11の反復計算）。
+
+    von Karman : be = b * (Fcr_skin / f_skin)**(1/2)
+    Marguerre  : be = b * (Fcr_skin / f_skin)**(1/3)
+
+    f_skin = f_stringer * E_skin / E_stringer  （外板とストリンガのひずみは等しい）
+
+柱強度はクリップリング応力Fccを上限とするJohnson-Euler式。
+    L'/ρ < π*sqrt(2E/Fcc) : Fc = Fcc - Fcc**2/(4π**2 E) * (L'/ρ)**2
+    L'/ρ >= π*sqrt(2E/Fcc): Fc = π**2 E / (L'/ρ)**2
+"""
+
+from collections import namedtuple
+import numpy as np
+
+PostbuckledPanel = namedtuple("PostbuckledPanel",
+                              ["stress", "effective_width", "area", "radius_gyration",
+                               "load", "iterations", "converged"])
+
+EXPONENT = {"karman": 0.5, "marguerre": 1.0 / 3}
+
+
+def effective_width(width, stress_cr, stress_skin, method="karman"):
+    """外板の有効幅 [mm]
+    Args:
+        width (np.array) : ストリンガ間隔（パネル幅） [mm]
+        stress_cr (np.array) : 外板の座屈応力 [MPa]
+        stress_skin (np.array) : 外板に生じる圧縮応力 [MPa]
+        method (str, optional) : "karman" or "marguerre"
+    """
+    ratio = np.clip(stress_cr / np.maximum(stress_skin, 1e-12), 0.0, 1.0)
+    return width * ratio**EXPONENT[method]
+
+
+def johnson_euler(Fcc, modulus_Young, slenderness):
+    """クリップリング応力を上限とした柱の座屈応力 [MPa]
+    Args:
+        Fcc (np.array) : クリップリング応力 [MPa]
+        modulus_Young (float) : ヤング率 [GPa]
+        slenderness (np.array) : 有効細長比 L'/ρ
+    """
+    E = modulus_Young * 1e3
+    transition = np.pi * np.sqrt(2 * E / Fcc)
+    johnson = Fcc - Fcc**2 / (4 * np.pi**2 * E) * slenderness**2
+    euler = np.pi**2 * E / np.maximum(slenderness, 1e-12)**2
+    return np.where(slenderness < transition, johnson, euler)
+
+
+def combined_section(stringer, width_e, thickness_skin, ratio_E):
+    """ストリンガと有効幅外板の組み合わせ断面（ストリンガ材に換算）
+    外板はストリンガ接合面の下側（y = -t_skin/2）にあるとする。
+    Args:
+        stringer (SectionProperties) : ストリンガ断面特性（stringer_section.py）
+        width_e (np.array) : 外板の有効幅 [mm]
+        thickness_skin (np.array) : 外板肉厚 [mm]
+        ratio_E (float) : 外板ヤング率/ストリンガヤング率
+    Returns:
+        (断面積 [mm2], 断面二次半径 [mm])
+    """
+    area_skin = ratio_E * width_e * thickness_skin
+    area = stringer.area + area_skin
+    centroid = (stringer.area * stringer.centroid - area_skin * thickness_skin / 2) / area
+    inertia = stringer.inertia + stringer.area * (stringer.centroid - centroid)**2 \
+              + area_skin * thickness_skin**2 / 12 + area_skin * (thickness_skin / 2 + centroid)**2
+    return area, np.sqrt(inertia / area)
+
+
+def solve_postbuckled_panel(stringer, Fcc, modulus_Young, width, thickness_skin,
+                            modulus_Young_skin, stress_cr_skin, length, c=1.0,
+                            method="karman", tol=1e-6, max_iter=50):
+    """座屈後のパネル破壊応力を固定点反復で求める。引数はすべてブロードキャスト可能な配列。
+    Args:
+        stringer (SectionProperties) : ストリンガ断面特性
+        Fcc (np.array) : ストリンガのクリップリング応力 [MPa]
+        modulus_Young (float) : ストリンガのヤング率 [GPa]
+        width (np.array) : ストリンガ間隔 [mm]
+        thickness_skin (np.array) : 外板肉厚 [mm]
+        modulus_Young_skin (float) : 外板のヤング率 [GPa]
+        stress_cr_skin (np.array) : 外板の座屈応力 [MPa]
+        length (np.array) : 柱長さ（リング間隔） [mm]
+        c (float, optional) : 端末固定係数、L' = L/sqrt(c)
+        method (str, optional) : 有効幅の式 "karman" or "marguerre"
+        tol (float, optional) : 収束判定（応力の相対変化）
+        max_iter (int, optional) : 最大反復回数
+    Returns:
+        PostbuckledPanel : ストリンガ破壊応力[MPa]、有効幅[mm]、換算断面積[mm2]、断面二次半径[mm]、
+                           ストリンガ1本あたりの許容荷重[N]、反復回数、収束したかどうか
+    """
+    ratio_E = modulus_Young_skin / modulus_Young
+    slenderness_length = length / np.sqrt(c)
+    stress = np.asarray(Fcc, dtype=float)
+    converged = False
+    for iteration in range(1, max_iter + 1):
+        width_e = effective_width(width, stress_cr_skin, stress * ratio_E, method)
+        area, radius_gyration = combined_section(stringer, width_e, thickness_skin, ratio_E)
+        stress_new = johnson_euler(Fcc, modulus_Young, slenderness_length / radius_gyration)
+        change = np.abs(stress_new - stress) / np.maximum(np.abs(stress_new), 1e-12)
+        stress = stress_new
+        if np.all(~(change > tol)):  # nanの要素（成立しない寸法）は収束判定から除く
+            converged = True
+            break
+
+    width_e = effective_width(width, stress_cr_skin, stress * ratio_E, method)
+    area, radius_gyration = combined_section(stringer, width_e, thickness_skin, ratio_E)
+    return PostbuckledPanel(stress, width_e, area, radius_gyration, stress * area, iteration, converged)
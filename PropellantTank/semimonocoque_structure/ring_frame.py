@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+リングフレームのサイジングと補強円筒の全体座屈（general instability）判定
+
+Shanleyのフレーム剛性基準により、補強円筒が全体座屈しないために必要な
+リングフレーム曲げ剛性を求め、ストリンガと同じ断面ライブラリでリング断面を決める。
+リング枚数、フレーム寸法は配列で与えてブロードキャストで一括計算する。
+
+    (EI)f = Cf * M * D**2 / L    (Shanley, Cf = 1/16000)
+
+    M : 曲げモーメント [N*mm]、軸圧縮力PはM = P*D/4で等価曲げモーメントに換算
+    D : 円筒外径 [mm]
+    L : フレーム間隔 [mm]
+源泉はBruhn本C9.14、Shanley "Simplified Analysis of General Instability of Stiffened Shells in Pure Bending"。
+"""
+
+from collections import namedtuple
+import numpy as np
+
+SHANLEY_CF = 1.0 / 16000
+
+RingFrameResult = namedtuple("RingFrameResult",
+                             ["frame_spacing", "EI_required", "H", "area", "inertia", "margin", "minimum"])
+
+
+def frame_spacing(length_all, num_ring):
+    """リング枚数からフレーム間隔[mm]を求める（両端は結合部で支持）"""
+    return length_all / (np.asarray(num_ring, dtype=float) + 1)
+
+
+def shanley_required_EI(moment, diameter, spacing, C_f=SHANLEY_CF):
+    """Shanley基準で必要なリングフレームの曲げ剛性
+    Args:
+        moment (float or np.array) : 曲げモーメント [N*mm]
+        diameter (float or np.array) : 円筒外径 [mm]
+        spacing (float or np.array) : フレーム間隔 [mm]
+        C_f (float, optional) : Shanley係数
+    Returns:
+        (EI)f (np.array) : 必要曲げ剛性 [N*mm2]
+    """
+    return C_f * np.asarray(moment, dtype=float) * diameter**2 / spacing
+
+
+def size_ring_frame(EI_required, modulus_Young, section, H, **dims):
+    """必要曲げ剛性を満たす最小のリング高さを求める
+    Args:
+        EI_required (np.array) : 必要曲げ剛性 [N*mm2]
+        modulus_Young (float) : リング材のヤング率 [GPa]
+        section (StringerSection) : リング断面形状（stringer_section.py）
+        H (np.array) : 探索するリング高さの候補、昇順 [mm]
+        **dims (float or np.array) : H以外の断面寸法 [mm]、EI_requiredとブロードキャスト可能な形状
+    Returns:
+        RingFrameResult : frame_spacing以外を埋めたもの、満たす高さがない場合はnan
+                          minimumは候補の最小高さで満たした（Shanley基準ではなく探索の下限で決まった）もの
+    """
+    EI_required = np.asarray(EI_required, dtype=float)
+    shape = np.broadcast(EI_required, *[np.asarray(v) for v in dims.values()]).shape
+    H = np.asarray(H, dtype=float).reshape((-1,) + (1,) * len(shape))
+    props = section.properties(H=H, **dims)
+    inertia = np.broadcast_to(props.inertia, H.shape[:1] + shape)
+    area = np.broadcast_to(props.area, H.shape[:1] + shape)
+    EI = modulus_Young * 1e3 * inertia
+
+    ok = EI >= EI_required
+    found = ok.any(axis=0)
+    index = ok.argmax(axis=0)[np.newaxis]
+    H_ring = np.where(found, np.take_along_axis(np.broadcast_to(H, ok.shape), index, axis=0)[0], np.nan)
+    area_ring = np.where(found, np.take_along_axis(area, index, axis=0)[0], np.nan)
+    inertia_ring = np.where(found, np.take_along_axis(inertia, index, axis=0)[0], np.nan)
+    margin = general_instability_margin(modulus_Young * 1e3 * inertia_ring, EI_required)
+    minimum = found & (index[0] == 0)
+    return RingFrameResult(None, EI_required, H_ring, area_ring, inertia_ring, margin, minimum)
+
+
+def general_instability_margin(EI_frame, EI_required):
+    """補強円筒の全体座屈の安全余裕 MS = (EI)f / (EI)f,req - 1"""
+    return np.asarray(EI_frame, dtype=float) / EI_required - 1
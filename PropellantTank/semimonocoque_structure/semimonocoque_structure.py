@@ -19,8 +19,12 @@ Rev.B Aug-22 2018 kterakawa
 
 注意点:
 **曲げモーメントは等価軸圧縮力に変換されて計算されているP=4M/Dの等式を用いている。
-**リング枚数は計算結果関係ない。
+**check_load_casesでは軸力、曲げ、せん断、内圧の荷重ケース配列に対して相関式で安全余裕を一括判定する。
+**postbuckling_designでは外板の座屈後も有効幅（von Karman/Marguerre）分は荷重を受け持つとして設計する。
+**リング枚数はストリンガの柱長さと、ring_designでのリングフレーム寸法・全体座屈判定（Shanley基準）に使用する。
 **収束しない場合はfor文の範囲を変えてより初期肉厚を厚くするとうまくいく。
+**最適化ループなどからライブラリとして使う場合はSemimonocoqueParamsからsemimonocoque.from_paramsで作り、
+  size()で結果を構造化配列として受け取る（設定ファイル、print、グラフ出力を介さない）。
 """
 
 import numpy as np
@@ -32,113 +36,226 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from scipy import interpolate
 import csv
+from typing import NamedTuple, Optional
+from stringer_section import get_section, SECTIONS
+from ring_frame import SHANLEY_CF, frame_spacing, shanley_required_EI, size_ring_frame
+from effective_width import solve_postbuckled_panel
+from combined_load import interaction_margins
+
+
+#Bruhnのfig.C9.1を目視で関数化
+#ロケット外径2000mmで固定、肉厚tは1mm以上必要との想定からr/t over 2000はコメントアウト
+fig_c9_1_500 =[[1,5,15,35,50,100,190,600,1200,2400,4800],[4,5,8,15,21,42,80,250,500,1000,2000]]
+fig_c9_1_700 =[[1,13,30,50,80,400,800,1600,3200,6400],[4,7,11,17,25,125,250,500,1000,2000]]
+fig_c9_1_1000 =[[1,13,30,60,100,200,400,800,5400,10800],[4,7,10.5,16,23,40,76,150,1000,2000]]
+#fig_c9_1_2000 =[[1,5,40,60,100,300,600,900,9000],[4,5,12,15,21,50,90,130,1000]]
+#fig_c9_1_3000 =[[1,5,40,60,100,200,400,800,1000,5000,11000],[4,5,12,15,20.5,33,55,100,120,500,1000]]
+
+#インスタンスごとに作り直さないようモジュールで1度だけ補間関数を作る（範囲外はnan）
+function500 = interpolate.interp1d(fig_c9_1_500[0],fig_c9_1_500[1], bounds_error=False)
+function700 = interpolate.interp1d(fig_c9_1_700[0],fig_c9_1_700[1], bounds_error=False)
+function1000 = interpolate.interp1d(fig_c9_1_1000[0],fig_c9_1_1000[1], bounds_error=False)
+
+#サイジング結果の構造化配列の型
+PANEL_DTYPE = np.dtype([("t", "f8"),        #パネル肉厚[mm]
+                        ("area", "f8"),     #パネル1枚の断面積[mm2]
+                        ("stress", "f8"),   #荷重応力[MPa]
+                        ("Fcr", "f8"),      #座屈応力[MPa]
+                        ("s_ratio", "f8")]) #安全率
+STRINGER_DTYPE = np.dtype([("H", "f8"),                #ウェブ高さ[mm]
+                           ("area", "f8"),             #ストリンガ断面積[mm2]
+                           ("stress", "f8"),           #荷重応力[MPa]
+                           ("Fcr", "f8"),              #座屈応力[MPa]
+                           ("s_ratio_panel", "f8"),    #パネル安全率
+                           ("s_ratio_stringer", "f8")]) #ストリンガ安全率
+DESIGN_DTYPE = np.dtype([("panel", PANEL_DTYPE),
+                         ("stringer", STRINGER_DTYPE)])
+
+
+class SemimonocoqueParams(NamedTuple):
+    """セミモノコック構造の計算条件（setting.iniの内容と同じ、単位も同じ）
+    最適化ループから設定ファイルを介さずにsemimonocoqueを作るためのレコード。
+    Noneの寸法はストリンガの寸法を流用する。
+    """
+    #ストリンガ物性値
+    STR_E: float            #ヤング率[GPa]
+    STR_v: float            #ポアソン比
+    STR_y: float            #耐力[MPa]
+    STR_density: float      #密度[kg/m3]
+    #外板物性値
+    FRP_E: float            #ヤング率[GPa]
+    FRP_v: float            #ポアソン比
+    FRP_y: float            #引張強さ[MPa]
+    FRP_density: float      #密度[kg/m3]
+    #ストリンガ初期寸法
+    STR_Fl_b: float         #フランジ幅b[mm]
+    STR_Fl_s: float         #フランジ肉厚s[mm]
+    STR_WE_t: float         #ウェブ初期肉厚t[mm]
+    #計算条件
+    f: float                #等価圧縮軸力[kN]
+    safety_factor: float    #全体安全率
+    safety_factor_FRP: float #外板単体安全率
+    external_diameter: float #外径[mm]
+    length_all: float       #全長[mm]
+    num_ring: float         #リング枚数
+    pressure: float         #内圧[MPa]
+    num_stringer: float     #桁数
+    #外力
+    compressive_stress: float = 0.0 #軸圧縮力[MPa]
+    bending_moment: float = 0.0     #曲げモーメント[MN*m]
+    #省略可能な項目
+    STR_material: str = ""
+    FRP_material: str = ""
+    STR_shape: str = "T"
+    STR_Fl_b2: Optional[float] = None #上フランジ幅b2[mm]（J字のみ）
+    STR_Cr_w: Optional[float] = None  #クラウン幅w[mm]（ハットのみ）
+    RING_shape: str = "Z"
+    RING_Fl_b: Optional[float] = None
+    RING_Fl_s: Optional[float] = None
+    RING_WE_t: Optional[float] = None
+    shanley_cf: float = SHANLEY_CF
+
+    @classmethod
+    def from_setting(cls, setting):
+        """読み込み済みのConfigParserから作る"""
+        return cls(
+            STR_material = setting.get('ストリンガ物性値','材料名'),
+            STR_E = setting.getfloat('ストリンガ物性値','ヤング率[GPa]'),
+            STR_v = setting.getfloat('ストリンガ物性値','ポアソン比'),
+            STR_y = setting.getfloat('ストリンガ物性値', '耐力[MPa]'),
+            STR_density = setting.getfloat('ストリンガ物性値', '密度[kg/m3]'),
+            FRP_material = setting.get('外板物性値','材料名'),
+            FRP_E = setting.getfloat('外板物性値','ヤング率[GPa]'),
+            FRP_v = setting.getfloat('外板物性値','ポアソン比'),
+            FRP_y = setting.getfloat('外板物性値', '引張強さ[MPa]'),
+            FRP_density = setting.getfloat('外板物性値', '密度[kg/m3]'),
+            STR_Fl_b = setting.getfloat('ストリンガ初期寸法','フランジ幅b[mm]'),
+            STR_Fl_s = setting.getfloat('ストリンガ初期寸法','フランジ肉厚s[mm]'),
+            STR_WE_t = setting.getfloat('ストリンガ初期寸法','ウェブ初期肉厚t[mm]'),
+            STR_shape = setting.get('ストリンガ初期寸法','断面形状', fallback='T'),
+            STR_Fl_b2 = setting.getfloat('ストリンガ初期寸法','上フランジ幅b2[mm]', fallback=None),
+            STR_Cr_w = setting.getfloat('ストリンガ初期寸法','クラウン幅w[mm]', fallback=None),
+            RING_shape = setting.get('リング初期寸法','断面形状', fallback='Z'),
+            RING_Fl_b = setting.getfloat('リング初期寸法','フランジ幅b[mm]', fallback=None),
+            RING_Fl_s = setting.getfloat('リング初期寸法','フランジ肉厚s[mm]', fallback=None),
+            RING_WE_t = setting.getfloat('リング初期寸法','ウェブ肉厚t[mm]', fallback=None),
+            f = setting.getfloat('計算条件', '等価圧縮軸力[kN]'),
+            safety_factor = setting.getfloat('計算条件', '全体安全率'),
+            safety_factor_FRP = setting.getfloat('計算条件', '外板単体安全率'),
+            external_diameter = setting.getfloat('計算条件', '外径[mm]'),
+            length_all = setting.getfloat('計算条件', '全長[mm]'),
+            num_ring = setting.getfloat('計算条件', 'リング枚数'),
+            pressure = setting.getfloat('計算条件', '内圧[MPa]'),
+            num_stringer = setting.getfloat('計算条件', '桁数'),
+            #constraint = setting.getfloat('計算条件', '支持条件')    未使用
+            shanley_cf = setting.getfloat('計算条件', 'Shanley係数', fallback=SHANLEY_CF),
+            compressive_stress = setting.getfloat('外力', '軸圧縮力[MPa]'),
+            bending_moment = setting.getfloat('外力', '曲げモーメント[MN*m]'))
+
+    @classmethod
+    def from_ini(cls, setting_file):
+        """設定ファイルから作る"""
+        setting = configparser.ConfigParser()
+        setting.optionxform = str  # 大文字小文字を区別するおまじない
+        setting.read(setting_file, encoding='utf8')
+        return cls.from_setting(setting)
 
 
 class semimonocoque:
-    def __init__(self, setting_file, reload = False):
+    def __init__(self, setting_file=None, reload = False, params=None):
+        #params: SemimonocoqueParams、指定した場合は設定ファイルを読まない
         # print("読み込み設定ファイル : %s" % (setting_file))
-        if (reload):  #再読込の際はself.settingの値をそのまま使う
-            pass
-        else:
-            self.setting_file = setting_file
-            self.setting = configparser.ConfigParser()
-            self.setting.optionxform = str  # 大文字小文字を区別するおまじない
-            self.setting.read(setting_file, encoding='utf8')
-        setting = self.setting
-        # print("読み込みセクション: ", end="")
-        # print(setting.sections())
-        
-        #ストリンガ物性値読み込み
-        self.STR_material = setting.get('ストリンガ物性値','材料名')
-        self.STR_E = setting.getfloat('ストリンガ物性値','ヤング率[GPa]')
-        self.STR_v = setting.getfloat('ストリンガ物性値','ポアソン比')
-        self.STR_y = setting.getfloat('ストリンガ物性値', '耐力[MPa]')
-        self.STR_density = setting.getfloat('ストリンガ物性値', '密度[kg/m3]') #未使用
-
-        #外板物性値読み込み
-        self.FRP_material = setting.get('外板物性値','材料名')
-        self.FRP_E = setting.getfloat('外板物性値','ヤング率[GPa]')
-        self.FRP_v = setting.getfloat('外板物性値','ポアソン比')
-        self.FRP_y = setting.getfloat('外板物性値', '引張強さ[MPa]')
-        self.FRP_density = setting.getfloat('外板物性値', '密度[kg/m3]') #未使用
-
-        #ストリンガ寸法初期値読み込み
-        self.STR_Fl_b = setting.getfloat('ストリンガ初期寸法','フランジ幅b[mm]')
-        self.STR_Fl_s = setting.getfloat('ストリンガ初期寸法','フランジ肉厚s[mm]')
-        self.STR_WE_t = setting.getfloat('ストリンガ初期寸法','ウェブ初期肉厚t[mm]')
-        
-        #計算条件読み込み
-        self.f=setting.getfloat('計算条件', '等価圧縮軸力[kN]')
-        self.safety_factor=setting.getfloat('計算条件', '全体安全率')
-        self.safety_factor_FRP=setting.getfloat('計算条件', '外板単体安全率')
-        self.external_diameter=setting.getfloat('計算条件', '外径[mm]')
-        self.length_all=setting.getfloat('計算条件', '全長[mm]')
-        self.num_ring=setting.getfloat('計算条件', 'リング枚数')
-        self.pressure=setting.getfloat('計算条件', '内圧[MPa]')
-        self.num_stringer=setting.getfloat('計算条件', '桁数')
-        #self.constraint=setting.getfloat('計算条件', '支持条件')    未使用
+        if params is None:
+            if (reload):  #再読込の際はself.settingの値をそのまま使う
+                pass
+            else:
+                self.setting_file = setting_file
+                self.setting = configparser.ConfigParser()
+                self.setting.optionxform = str  # 大文字小文字を区別するおまじない
+                self.setting.read(setting_file, encoding='utf8')
+            # print("読み込みセクション: ", end="")
+            # print(self.setting.sections())
+            params = SemimonocoqueParams.from_setting(self.setting)
+        self.set_params(params)
+
+        self.function500 = function500
+        self.function700 = function700
+        self.function1000 = function1000
+
+    @classmethod
+    def from_params(cls, params):
+        """SemimonocoqueParamsから作る（設定ファイルを介さない）"""
+        return cls(params=params)
+
+    def set_params(self, params):
+        #SemimonocoqueParamsの値を属性に展開する（属性名はフィールド名と同じ）
+        self.params = params
+        for name, value in zip(params._fields, params):
+            setattr(self, name, value)
+
+        #省略された寸法はストリンガの値を流用
+        if self.STR_Fl_b2 is None:
+            self.STR_Fl_b2 = self.STR_Fl_b  # J字のみ
+        if self.STR_Cr_w is None:
+            self.STR_Cr_w = self.STR_Fl_b  # ハットのみ
+        if self.RING_Fl_b is None:
+            self.RING_Fl_b = self.STR_Fl_b
+        if self.RING_Fl_s is None:
+            self.RING_Fl_s = self.STR_Fl_s
+        if self.RING_WE_t is None:
+            self.RING_WE_t = self.STR_WE_t
+        self.stringer_section = get_section(self.STR_shape)
+        self.ring_section = get_section(self.RING_shape)
         self.length = self.length_all/(self.num_ring+1)
-        
-        #外力読み込み
-        self.compressive_stress=setting.getfloat('外力', '軸圧縮力[MPa]')
-        self.bending_moment=setting.getfloat('外力', '曲げモーメント[MN*m]')
-        
-        #Bruhnのfig.C9.1を目視で関数化
-        #ロケット外径2000mmで固定、肉厚tは1mm以上必要との想定からr/t over 2000はコメントアウト
-        fig_c9_1_500 =[[1,5,15,35,50,100,190,600,1200,2400,4800],[4,5,8,15,21,42,80,250,500,1000,2000]]
-        fig_c9_1_700 =[[1,13,30,50,80,400,800,1600,3200,6400],[4,7,11,17,25,125,250,500,1000,2000]]
-        fig_c9_1_1000 =[[1,13,30,60,100,200,400,800,5400,10800],[4,7,10.5,16,23,40,76,150,1000,2000]]
-        #fig_c9_1_2000 =[[1,5,40,60,100,300,600,900,9000],[4,5,12,15,21,50,90,130,1000]]
-        #fig_c9_1_3000 =[[1,5,40,60,100,200,400,800,1000,5000,11000],[4,5,12,15,20.5,33,55,100,120,500,1000]]
-
-        self.function500 = interpolate.interp1d(fig_c9_1_500[0],fig_c9_1_500[1])
-        self.function700 = interpolate.interp1d(fig_c9_1_700[0],fig_c9_1_700[1])
-        self.function1000 = interpolate.interp1d(fig_c9_1_1000[0],fig_c9_1_1000[1])
-        #self.function2000 = interpolate.interp1d(fig_c9_1_2000[0],fig_c9_1_2000[1])
-        #self.function3000 = interpolate.interp1d(fig_c9_1_3000[0],fig_c9_1_3000[1])
-        
+
+    def panel_sweep(self, t):
+        #パネル肉厚tの配列に対して座屈応力Fcr [MPa]、パネル断面積、荷重応力を一括で計算する
+        #r/tがBruhn図の範囲外の肉厚はnanを返す
+        t = np.asarray(t, dtype=float)
+        b = pi*self.external_diameter/self.num_stringer  #パネル周方向長さ
+        Z = b**2/((self.external_diameter/2-t)*t)*sqrt(1-self.FRP_v**2)
+        r_over_t = (self.external_diameter/2-t)/t
+        Kc = np.select([(r_over_t >=100) & (r_over_t<600),
+                        (r_over_t>=600) & (r_over_t<850),
+                        (r_over_t>=850) & (r_over_t<2000)],
+                       [function500(Z), function700(Z), function1000(Z)], np.nan)
+        Fcr = Kc*pi**2*self.FRP_E/(12*sqrt(1-self.FRP_v**2))*(t/b)**2*1000
+
+        #曲面パネルへの荷重応力stress_panel [MPa]の計算
+        area_panel = pi*((self.external_diameter/2)**2-(self.external_diameter/2-t)**2)/self.num_stringer
+        stress_panel = self.f/(area_panel*self.num_stringer)*10**3+self.pressure+4*self.bending_moment/(self.external_diameter*10**(-3))
+        return Fcr, area_panel, stress_panel
+
+    def size_panel(self, t=None):
+        #外板単体安全率を満たす最小パネル肉厚を求める。print、グラフ出力はしない。
+        #t: パネル肉厚の候補[mm]、Noneは0.1~2.9mm
+        #return: PANEL_DTYPEの構造化配列（0次元）、満たす肉厚がない場合はnan
+        if t is None:
+            t = 0.1*np.arange(1,30)
+        t = np.asarray(t, dtype=float)
+        Fcr, area_panel, stress_panel = self.panel_sweep(t)
+        result = np.full((), np.nan, dtype=PANEL_DTYPE)
+        index = np.flatnonzero(Fcr/stress_panel > self.safety_factor_FRP)
+        if index.size > 0:
+            i = index[0]
+            result[()] = (t[i], area_panel[i], stress_panel[i], Fcr[i], Fcr[i]/stress_panel[i])
+        return result
+
     def panel_designe(self):
         #座屈応力=パネル荷重応力となるようなパネル肉厚を求める
-        Fcr_list = []
-        stress_panel_list =[]
-        s_ratio_panel = [] 
-        x = []
+        t = 0.1*np.arange(1,30) #板圧の条件を設定する
+        Fcr, area_panel, stress_panel = self.panel_sweep(t)
+        valid = ~np.isnan(Fcr)
+        x = t[valid]
+        Fcr_list = Fcr[valid]
+        stress_panel_list = stress_panel[valid]
+        s_ratio_panel = Fcr_list/stress_panel_list
+
+        #result[パネル肉厚、パネル断面積、パネル荷重応力、パネル座屈荷重]
         result_panel = [0,0,0,0]
-        for i in range(1,30,1): #rangeで板圧の条件を設定する
-            t = 0.1*i
-            
-            #座屈応力Fcr [MPa]の計算
-            b = pi*self.external_diameter/self.num_stringer  #パネル周方向長さ
-            Z = b**2/((self.external_diameter/2-t)*t)*sqrt(1-self.FRP_v**2)
-            r_over_t = (self.external_diameter/2-t)/t
-            if r_over_t >=100 and r_over_t<600:
-                Kc = self.function500(Z)
-                #print(500)
-            elif r_over_t>=600 and r_over_t<850:
-                Kc = self.function700(Z)
-                #print(700)
-            elif r_over_t>=850 and r_over_t<2000:
-                Kc = self.function1000(Z)
-                #print(1000)
-            else:
-                continue
-            Fcr = Kc*pi**2*self.FRP_E/(12*sqrt(1-self.FRP_v**2))*(t/b)**2*1000
-            
-            #曲面パネルへの荷重応力stress_panel [MPa]の計算
-            area_panel = pi*((self.external_diameter/2)**2-(self.external_diameter/2-t)**2)/self.num_stringer
-            stress_panel = self.f/(area_panel*self.num_stringer)*10**3+self.pressure+4*self.bending_moment/(self.external_diameter*10**(-3))
-            
-            Fcr_list.append(Fcr)
-            stress_panel_list.append(stress_panel)
-            s_ratio_panel.append(Fcr/stress_panel)
-            x.append(t)
-            
-            if Fcr/stress_panel > self.safety_factor_FRP and result_panel[0] == 0:
-            #result[パネル肉厚、パネル荷重応力、パネル座屈荷重]
-                result_panel[0]=t
-                result_panel[1]=area_panel
-                result_panel[2]= stress_panel
-                result_panel[3] = Fcr
+        panel = self.size_panel(t)
+        if not np.isnan(panel["t"]):
+            result_panel = [panel["t"].item(), panel["area"].item(), panel["stress"].item(), panel["Fcr"].item()]
                 
         plt.figure()
         title = "パネル肉厚の決定"
@@ -163,11 +280,181 @@ class semimonocoque:
         
         return result_panel
     
+    def stringer_dimensions(self, H):
+        #ストリンガ断面寸法をsetting.iniの値とウェブ高さHから組み立てる
+        return {"H": H,
+                "b": self.STR_Fl_b,
+                "b2": self.STR_Fl_b2,
+                "w": self.STR_Cr_w,
+                "s": self.STR_Fl_s,
+                "t": self.STR_WE_t}
+
+    def stringer_sweep(self, H, area_panel, section=None, length=None):
+        #ウェブ高さHの配列に対してストリンガ断面積、荷重応力、座屈応力を一括で計算する
+        #section: stringer_section.pyの断面、Noneの場合は設定ファイルの断面形状
+        #length: ストリンガ柱長さ[mm]、Noneの場合はリング枚数から求めたself.length
+        if section is None:
+            section = self.stringer_section
+        if length is None:
+            length = self.length
+        props = section.properties(**self.stringer_dimensions(H))
+        area_stringer = props.area
+        stress = self.f/((area_stringer + area_panel)*self.num_stringer)*10**3+self.pressure+4*self.bending_moment/(self.external_diameter*10**(-3))
+        Fcr_stringer = pi**2*self.STR_E*10**3*props.inertia/(length**2*area_stringer)
+        return area_stringer, stress, Fcr_stringer
+
+    def compare_stringer_sections(self, area_panel, sections=None):
+        #断面形状ごとに安全率を満たす最小ウェブ高さとストリンガ断面積を求める
+        #return: {断面形状名: (ウェブ高さ[mm], ストリンガ断面積[mm2])}、成立しない場合はnan
+        if sections is None:
+            sections = SECTIONS.values()
+        H = self.STR_Fl_s + 0.1*np.arange(10,1000)
+        result = {}
+        for section in sections:
+            area_stringer, stress, Fcr_stringer = self.stringer_sweep(H, area_panel, section)
+            index = np.flatnonzero(Fcr_stringer/stress > self.safety_factor)
+            if index.size == 0:
+                result[section.name] = (np.nan, np.nan)
+            else:
+                result[section.name] = (H[index[0]], area_stringer[index[0]])
+        return result
+
+    def equivalent_moment(self):
+        #等価圧縮軸力と曲げモーメントをShanley基準用の曲げモーメント[N*mm]にまとめる（M = P*D/4）
+        return self.bending_moment*10**9 + self.f*10**3*self.external_diameter/4
+
+    def ring_design(self, area_panel, num_ring=None, **ring_dims):
+        #リング枚数とリング寸法の組み合わせに対してリングフレームを一括でサイジングする。
+        #num_ring: リング枚数の配列、Noneの場合は0~10枚
+        #ring_dims: リング断面寸法(b, s, t, b2, w)の上書き、num_ringとブロードキャスト可能な配列
+        #return: (RingFrameResult, ストリンガ高さ[mm], 重量の辞書[kg])
+        #ring.minimumがTrueのリングは成立する最小断面でも必要剛性を上回る（寸法は最小寸法で決まり、Shanley基準でサイジングされていない）
+        #ストリンガはリング枚数で決まる柱長さで再サイジングし、リングとストリンガの重量トレードを見る。
+        if num_ring is None:
+            num_ring = np.arange(0, 11)
+        num_ring = np.asarray(num_ring, dtype=float)
+        dims = {"b": self.RING_Fl_b, "b2": self.RING_Fl_b, "w": self.RING_Fl_b,
+                "s": self.RING_Fl_s, "t": self.RING_WE_t}
+        dims.update(ring_dims)
+        dims = {key: dims[key] for key in self.ring_section.dims if key != "H"}
+
+        L = frame_spacing(self.length_all, num_ring)
+        EI_required = shanley_required_EI(self.equivalent_moment(), self.external_diameter, L, self.shanley_cf)
+        #探索はウェブ高さが0になる高さの直上から（寸法を配列で与えた場合は最も大きいフランジ肉厚に合わせる）
+        H_ring = np.max(self.ring_section.min_height(dims["s"])) + 0.1*np.arange(1,2000)
+        ring = size_ring_frame(EI_required, self.STR_E, self.ring_section, H_ring, **dims)
+        #リング枚数0ではリングが存在しないのでリング寸法と安全余裕はnan
+        has_ring = num_ring > 0
+        ring = ring._replace(frame_spacing=L,
+                             H=np.where(has_ring, ring.H, np.nan),
+                             area=np.where(has_ring, ring.area, np.nan),
+                             inertia=np.where(has_ring, ring.inertia, np.nan),
+                             margin=np.where(has_ring, ring.margin, np.nan),
+                             minimum=has_ring & ring.minimum)
+
+        #リング枚数ごとのストリンガ高さ（ストリンガ安全率を満たす最小値）
+        H = (self.STR_Fl_s + 0.1*np.arange(10,1000)).reshape((-1,) + (1,)*L.ndim)
+        area_stringer, stress, Fcr_stringer = self.stringer_sweep(H, area_panel, length=L)
+        ok = Fcr_stringer/stress > self.safety_factor
+        index = ok.argmax(axis=0)
+        found = ok.any(axis=0)
+        H_stringer = np.where(found, H.ravel()[index], np.nan)
+        area_stringer = np.where(found, np.take_along_axis(np.broadcast_to(area_stringer, ok.shape), index[np.newaxis], axis=0)[0], np.nan)
+
+        #重量[kg]（密度[kg/m3]、寸法[mm]）
+        mass_ring = np.where(has_ring, num_ring*ring.area*pi*self.external_diameter*self.STR_density*10**(-9), 0.0)
+        mass_stringer = self.num_stringer*area_stringer*self.length_all*self.STR_density*10**(-9)
+        mass = {"リング": mass_ring,
+                "ストリンガ": mass_stringer,
+                "合計": mass_ring + mass_stringer}
+        return ring, H_stringer, mass
+
+    def equivalent_axial_load(self):
+        #等価圧縮軸力と曲げモーメントを全周の等価軸圧縮力[N]にまとめる（P = 4M/D、内圧による軽減は無視）
+        return self.f*10**3 + 4*self.bending_moment*10**9/self.external_diameter
+
+    def postbuckling_design(self, t_panel=None, H=None, method="karman", section=None):
+        #外板の座屈後強度を考慮してパネル肉厚とストリンガ高さのグリッドを一括評価する。
+        #t_panel: パネル肉厚の配列[mm]、Noneはpanel_designeと同じ0.1~2.9mm
+        #H: ストリンガ高さの配列[mm]、Noneはstringer_designと同じ範囲
+        #method: 有効幅の式 "karman" or "marguerre"
+        #return: (PostbuckledPanel, 安全余裕, 単位長さあたり重量[kg/m], 重量最小の(パネル肉厚, ストリンガ高さ))
+        #外板の座屈応力はpanel_designeと同じ曲面パネルの値（panel_sweep）。
+        #r/tがBruhn図の範囲外の肉厚は平板（4辺単純支持, K=4）の値を使う（曲率の効果を無視する安全側の値）。
+        if t_panel is None:
+            t_panel = 0.1*np.arange(1,30)
+        if H is None:
+            H = self.STR_Fl_s + 0.1*np.arange(10,1000)
+        if section is None:
+            section = self.stringer_section
+        t_panel = np.asarray(t_panel, dtype=float)[:, np.newaxis]
+        H = np.asarray(H, dtype=float)[np.newaxis, :]
+
+        b = pi*self.external_diameter/self.num_stringer  #パネル周方向長さ
+        Fcr_flat = 4*pi**2*self.FRP_E*10**3/(12*(1-self.FRP_v**2))*(t_panel/b)**2
+        Fcr_skin = self.panel_sweep(t_panel)[0]
+        Fcr_skin = np.where(np.isnan(Fcr_skin), Fcr_flat, Fcr_skin)
+        dims = self.stringer_dimensions(H)
+        stringer = section.properties(**dims)
+        Fcc = section.crippling_stress(self.STR_E, self.STR_y, **dims)
+        panel = solve_postbuckled_panel(stringer, Fcc, self.STR_E, b, t_panel,
+                                        self.FRP_E, Fcr_skin, self.length, method=method)
+
+        load = self.equivalent_axial_load()/self.num_stringer  #ストリンガ1本（パネル1枚）あたり
+        margin = panel.load/(load*self.safety_factor) - 1
+        mass = self.num_stringer*(stringer.area*self.STR_density + b*t_panel*self.FRP_density)*10**(-6)
+        mass_ok = np.where(margin >= 0, mass, np.inf)
+        if np.isfinite(mass_ok).any():
+            i, j = np.unravel_index(np.argmin(mass_ok), mass_ok.shape)
+            optimum = (t_panel[i, 0], H[0, j])
+        else:
+            optimum = (np.nan, np.nan)
+        return panel, margin, mass, optimum
+
+    def size_stringer(self, area_panel, Fcr_panel, H=None, section=None):
+        #ストリンガ安全率を満たす最小ウェブ高さを求める。print、グラフ、csv出力はしない。
+        #return: STRINGER_DTYPEの構造化配列（0次元）、満たす高さがない場合はnan
+        if H is None:
+            H = self.STR_Fl_s + 0.1*np.arange(10,1000)
+        H = np.asarray(H, dtype=float)
+        area_stringer, stress, Fcr_stringer = self.stringer_sweep(H, area_panel, section)
+        result = np.full((), np.nan, dtype=STRINGER_DTYPE)
+        index = np.flatnonzero(Fcr_stringer/stress > self.safety_factor)
+        if index.size > 0:
+            i = index[0]
+            result[()] = (H[i], area_stringer[i], stress[i], Fcr_stringer[i],
+                          Fcr_panel/stress[i], Fcr_stringer[i]/stress[i])
+        return result
+
+    def size(self):
+        #パネル肉厚とストリンガ高さを順に決める（panel_designe + stringer_designの計算部分のみ）
+        #return: DESIGN_DTYPEの構造化配列（0次元）、result["panel"]["t"]、result["stringer"]["H"]のように参照
+        result = np.full((), np.nan, dtype=DESIGN_DTYPE)
+        panel = self.size_panel()
+        result["panel"] = panel
+        if not np.isnan(panel["t"]):
+            result["stringer"] = self.size_stringer(panel["area"], panel["Fcr"])
+        return result
+
+    def check_load_cases(self, N, M, V, p, design=None, stabilization=True):
+        #荷重ケースの配列に対してパネルとストリンガの安全余裕を相関式で一括判定する（combined_load.py）
+        #N: 軸圧縮力[N]（圧縮が正）、M: 曲げモーメント[N*m]、V: せん断力[N]、p: 内圧[MPa]
+        #design: DESIGN_DTYPEの構造化配列（任意の形状）、Noneはsize()の結果
+        #return: InteractionResult、安全余裕は(荷重ケース, *design.shape)の配列、governingは設計ごとの支配ケース番号
+        if design is None:
+            design = self.size()
+        panel = design["panel"]
+        stringer = design["stringer"]
+        return interaction_margins(N, M, V, p, self.external_diameter, self.num_stringer,
+                                   panel["t"], panel["area"], panel["Fcr"], stringer["area"], stringer["Fcr"],
+                                   self.FRP_E, self.FRP_v, self.safety_factor_FRP, self.safety_factor,
+                                   stabilization)
+
     def stringer_design(self,t_panel,t_stringer,area_panel,stress_panel,Fcr_panel):
         #ストリンガのウェブ高さを計算する。
         #ストリンガも含めた形状の安全率を再度計算する。
         #ストリンガのフランジ部は固定値とする。
-        #MOMO2を参考にT字形状とする。
+        #断面形状は設定ファイルの断面形状（デフォルトはMOMO2を参考にT字形状）とする。
         self.t_panel = t_panel
         self.t_stringer = self.STR_WE_t  #self.STR_WE_t: ウェブ肉厚初期値 (setting.iniから取得)
         self.area_panel = area_panel
@@ -178,40 +465,23 @@ class semimonocoque:
         #self.STR_Fl_s: フランジ肉厚固定値 (setting.iniから取得)
        
         
-        stress_list=[]
-        Fcr_stringer_list = []
-        s_ratio_panel = []
-        s_ratio_stringer =[]
-        H_list = []
+        H_list = self.STR_Fl_s + 0.1*np.arange(10,1000)
+        area_stringer_list, stress_list, Fcr_stringer_list = self.stringer_sweep(H_list, self.area_panel)
+        s_ratio_panel = self.Fcr_panel/stress_list
+        s_ratio_stringer = Fcr_stringer_list/stress_list
         result_H = 0
-        for i in range(10,1000,1):
-            H = self.STR_Fl_s + i*0.1
-            
-            #ストリンガ荷重応力の計算
-            area_stringer = (H-self.STR_Fl_s)*self.t_stringer+self.STR_Fl_s*self.STR_Fl_b        
-            stress = self.f/((area_stringer + self.area_panel)*self.num_stringer)*10**3+self.pressure+4*self.bending_moment/(self.external_diameter*10**(-3))
-            
-            #座屈応力の計算
-            e1 = H-(H**2*self.t_stringer+self.STR_Fl_s**2*(self.STR_Fl_b-self.t_stringer))/(2*(self.STR_Fl_b*self.STR_Fl_s+self.t_stringer*(H-self.STR_Fl_s)))
-            e2 = (H**2*self.t_stringer+self.STR_Fl_s**2*(self.STR_Fl_b-self.t_stringer))/(2*(self.STR_Fl_b*self.STR_Fl_s+self.t_stringer*(H-self.STR_Fl_s)))
-            I = (self.t_stringer*e1**3+self.STR_Fl_b*e2**3-(self.STR_Fl_b-self.t_stringer)*(e2-self.STR_Fl_s)**3)/3
-            Fcr_stringer = pi**2*self.STR_E*10**3*I/(self.length**2*area_stringer)
-
-            stress_list.append(stress)
-            Fcr_stringer_list.append(Fcr_stringer)
-            s_ratio_panel.append(self.Fcr_panel/stress)
-            s_ratio_stringer.append(Fcr_stringer/stress)
-            H_list.append(H)
-            
-            if Fcr_stringer/stress >self.safety_factor and result_H==0:
-               result_s_ratio_panel=self.Fcr_panel/stress   
-               result_s_ratio_stringer=Fcr_stringer/stress
+        index = np.flatnonzero(s_ratio_stringer > self.safety_factor)
+        if index.size > 0:
+               i = index[0]
+               area_stringer = area_stringer_list[i]
+               result_s_ratio_panel=s_ratio_panel[i]
+               result_s_ratio_stringer=s_ratio_stringer[i]
                result_t_panel=self.t_panel
                result_t_stringer=self.t_stringer
-               result_H=H
+               result_H=H_list[i]
                result_Fcr_panel = self.Fcr_panel
-               result_Fcr_stringer=Fcr_stringer
-               result_stress=stress
+               result_Fcr_stringer=Fcr_stringer_list[i]
+               result_stress=stress_list[i]
                
                print("----------パネル諸元-------------")
                print("長さ[mm] " + str(self.length))
@@ -222,6 +492,7 @@ class semimonocoque:
                print("安全率　　　　　" + str(result_s_ratio_panel))
                
                print("----------ストリンガ諸元-------------") 
+               print("断面形状 " + self.stringer_section.name)
                print("長さ[mm]　" + str(self.length))
                print("ウェブ肉厚[mm] " + str(result_t_stringer))
                print("フランジ肉厚[mm] " + str(self.STR_Fl_s))
@@ -246,6 +517,7 @@ class semimonocoque:
                    writer.writerow(["安全率",result_s_ratio_panel])
                    writer.writerow(["",""])
                    writer.writerow(["ストリンガ諸元",""])
+                   writer.writerow(["断面形状",self.stringer_section.name])
                    writer.writerow(["長さ[mm]",self.length])
                    writer.writerow(["ウェブ肉厚[mm]",result_t_stringer])
                    writer.writerow(["フランジ肉厚[mm] ",self.STR_Fl_s])
@@ -282,3 +554,18 @@ if __name__ == '__main__':
     semimonocoque = semimonocoque(setting_file)
     result_panel = semimonocoque.panel_designe()
     semimonocoque.stringer_design(result_panel[0],int(result_panel[0]+1),result_panel[1],result_panel[2],result_panel[3])
+
+    #リング枚数とストリンガ高さのトレード
+    ring, H_stringer, mass = semimonocoque.ring_design(result_panel[1])
+    print("----------リング枚数トレード-------------")
+    print("リング枚数, フレーム間隔[mm], リング高さ[mm], 全体座屈安全余裕, ストリンガ高さ[mm], 重量[kg]")
+    for i, num_ring in enumerate(np.arange(0, 11)):
+        print("%d, %.1f, %.1f, %.2f, %.1f, %.3f%s" % (num_ring, ring.frame_spacing[i], ring.H[i], ring.margin[i], H_stringer[i], mass["合計"][i],
+                                                   ", 最小断面（Shanley基準に余裕）" if ring.minimum[i] else ""))
+
+    #座屈後強度（有効幅法）を考慮した重量最小設計
+    panel, margin, mass, optimum = semimonocoque.postbuckling_design()
+    print("----------座屈後強度設計（有効幅法）-------------")
+    print("反復回数 " + str(panel.iterations))
+    print("パネル肉厚[mm] " + str(optimum[0]))
+    print("ウェブ高さ[mm] " + str(optimum[1]))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+ストリンガ断面形状ライブラリ
+
+T字、Z字、ハット、J字、L字（アングル）断面のストリンガについて、
+断面積、図心位置、断面二次モーメント、断面二次半径を寸法の配列に対して一括で計算する。
+各断面は長方形要素の組み合わせとして定義し、寸法の組ごとに計算結果をキャッシュする。
+
+寸法記号（単位はすべてmm）:
+    H  : ストリンガ全高（外板接合面から先端まで）
+    b  : 外板側フランジ幅（ハットは片側の接合フランジ幅）
+    s  : フランジ肉厚
+    t  : ウェブ肉厚
+    b2 : J字断面の上フランジ幅
+    w  : ハット断面のクラウン幅
+
+注意点:
+**図心位置は外板接合面からの距離、断面二次モーメントは外板に平行な図心軸まわりの値。
+**外板に平行な軸まわりの値なのでL字断面はT字断面と同じ値になる。
+**成立しない寸法（ウェブ高さが0以下など）の要素はnanを返す。
+**クリップリング応力はBruhn本C7のNeedham法を要素ごとに適用し、面積で重み付け平均する。
+"""
+
+from abc import ABCMeta, abstractmethod
+from collections import namedtuple, OrderedDict
+import numpy as np
+
+SectionProperties = namedtuple("SectionProperties",
+                               ["area", "centroid", "inertia", "radius_gyration"])
+
+# Needham法の係数Ce（自由辺の数ごと）、Fcs = Ce*sqrt(E*Fcy)/(b/t)**0.75
+NEEDHAM_CE = {0: 0.366, 1: 0.316}
+
+
+class StringerSection(metaclass=ABCMeta):
+    """ストリンガ断面の基底クラス
+    派生クラスでdims, rectangles, elementsを定義する（定義していない派生クラスは作成時にTypeError）。
+    Attributes:
+        name (str) : 断面形状名
+        dims (tuple) : 断面寸法の引数名
+        cache_size (int) : キャッシュする寸法の組の数
+        flanges (int) : ウェブの上下にあるフランジの数（最小高さmin_heightに使う）
+    """
+    name = ""
+    dims = ()
+    cache_size = 128
+    flanges = 1
+
+    def __init__(self):
+        self._cache = OrderedDict()
+
+    @abstractmethod
+    def rectangles(self, **dims):
+        """断面を構成する長方形要素のリスト[(幅, 高さ, 外板接合面から下端までの距離), ...]"""
+
+    @abstractmethod
+    def elements(self, **dims):
+        """クリップリング計算用の板要素のリスト[(幅, 板厚, 自由辺の数), ...]"""
+
+    def min_height(self, s):
+        """ウェブ高さが0になる全高H [mm]、成立する断面はこれより高い"""
+        return self.flanges * np.asarray(s, dtype=float)
+
+    def crippling_stress(self, modulus_Young, proof_stress, **dims):
+        """断面のクリップリング応力（Needham法、要素ごとの値を面積で重み付け平均）
+        Args:
+            modulus_Young (float) : ヤング率 [GPa]
+            proof_stress (float) : 耐力 [MPa]、要素のクリップリング応力の上限
+            **dims (float or np.array) : self.dimsの各寸法 [mm]
+        Returns:
+            Fcc (np.array) : クリップリング応力 [MPa]
+        """
+        E = modulus_Young * 1e3
+        force = 0.0
+        area = 0.0
+        for (width, thickness, free_edge) in self.elements(**{key: np.asarray(dims[key], dtype=float) for key in self.dims}):
+            width = np.maximum(width, 0.0)
+            ratio = np.maximum(width, 1e-12) / thickness
+            Fcs = np.minimum(NEEDHAM_CE[free_edge] * np.sqrt(E * proof_stress) / ratio**0.75, proof_stress)
+            force = force + Fcs * width * thickness
+            area = area + width * thickness
+        return force / area
+
+    def properties(self, **dims):
+        """断面特性を計算する。寸法はブロードキャスト可能な配列で与える。
+        Args:
+            **dims (float or np.array) : self.dimsの各寸法 [mm]、余分な寸法は無視する
+        Returns:
+            SectionProperties : 断面積[mm2], 図心位置[mm], 断面二次モーメント[mm4], 断面二次半径[mm]
+        """
+        missing = [key for key in self.dims if key not in dims]
+        if missing:
+            raise TypeError("%s断面の寸法が不足しています: %s" % (self.name, ", ".join(missing)))
+        arrays = [np.asarray(dims[key], dtype=float) for key in self.dims]
+        key = tuple((a.shape, a.tobytes()) for a in arrays)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        props = self._compute(dict(zip(self.dims, arrays)))
+        self._cache[key] = props
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return props
+
+    def _compute(self, dims):
+        rects = self.rectangles(**dims)
+        area = 0.0
+        first = 0.0
+        valid = True
+        for (width, height, y0) in rects:
+            area = area + width * height
+            first = first + width * height * (y0 + height / 2)
+            valid = valid & (width >= 0) & (height > 0)
+        centroid = first / np.where(area > 0, area, np.nan)
+        inertia = 0.0
+        for (width, height, y0) in rects:
+            inertia = inertia + width * height**3 / 12 + width * height * (y0 + height / 2 - centroid)**2
+        valid = valid & (area > 0)
+
+        area = np.where(valid, area, np.nan)
+        centroid = np.where(valid, centroid, np.nan)
+        inertia = np.where(valid, inertia, np.nan)
+        radius_gyration = np.sqrt(inertia / area)
+        if np.ndim(area) == 0:  # スカラー入力にはfloatで返す
+            return SectionProperties(float(area), float(centroid), float(inertia), float(radius_gyration))
+        for a in (area, centroid, inertia, radius_gyration):
+            a.setflags(write=False)  # キャッシュを共有するので書き換え禁止
+        return SectionProperties(area, centroid, inertia, radius_gyration)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+
+class TSection(StringerSection):
+    """T字断面、外板側にフランジ b x s、ウェブ t が全高Hまで立つ（MOMO2形状）"""
+    name = "T"
+    dims = ("H", "b", "s", "t")
+
+    def rectangles(self, H, b, s, t):
+        return [(b, s, 0.0),
+                (t, H - s, s)]
+
+    def elements(self, H, b, s, t):
+        return [((b - t) / 2, s, 1),
+                ((b - t) / 2, s, 1),
+                (H - s, t, 1)]
+
+
+class AngleSection(TSection):
+    """L字断面、外板に平行な軸まわりの断面特性はT字断面と同じ"""
+    name = "L"
+
+    def elements(self, H, b, s, t):
+        return [(b - t, s, 1),
+                (H - s, t, 1)]
+
+
+class ZSection(StringerSection):
+    """Z字断面、上下に幅 b のフランジ、間をウェブ t でつなぐ"""
+    name = "Z"
+    dims = ("H", "b", "s", "t")
+    flanges = 2
+
+    def rectangles(self, H, b, s, t):
+        return [(b, s, 0.0),
+                (t, H - 2 * s, s),
+                (b, s, H - s)]
+
+    def elements(self, H, b, s, t):
+        return [(b - t, s, 1),
+                (H - 2 * s, t, 0),
+                (b - t, s, 1)]
+
+
+class JSection(StringerSection):
+    """J字断面、外板側フランジ b と上フランジ b2 をウェブ t でつなぐ"""
+    name = "J"
+    dims = ("H", "b", "b2", "s", "t")
+    flanges = 2
+
+    def rectangles(self, H, b, b2, s, t):
+        return [(b, s, 0.0),
+                (t, H - 2 * s, s),
+                (b2, s, H - s)]
+
+    def elements(self, H, b, b2, s, t):
+        return [((b - t) / 2, s, 1),
+                ((b - t) / 2, s, 1),
+                (H - 2 * s, t, 0),
+                (b2 - t, s, 1)]
+
+
+class HatSection(StringerSection):
+    """ハット断面、両側の接合フランジ b、2枚のウェブ t、クラウン幅 w"""
+    name = "HAT"
+    dims = ("H", "b", "w", "s", "t")
+    flanges = 2
+
+    def rectangles(self, H, b, w, s, t):
+        return [(2 * b, s, 0.0),
+                (2 * t, H - 2 * s, s),
+                (w, s, H - s)]
+
+    def elements(self, H, b, w, s, t):
+        return [(b, s, 1),
+                (b, s, 1),
+                (H - 2 * s, t, 0),
+                (H - 2 * s, t, 0),
+                (w - 2 * t, s, 0)]
+
+
+SECTIONS = OrderedDict([("T", TSection()),
+                        ("Z", ZSection()),
+                        ("HAT", HatSection()),
+                        ("J", JSection()),
+                        ("L", AngleSection())])
+
+
+def get_section(name):
+    """断面形状名からストリンガ断面を取得する（キャッシュは形状ごとに共有）
+    Args:
+        name (str) : "T", "Z", "HAT", "J", "L" のいずれか（大文字小文字は区別しない）
+    """
+    key = name.strip().upper()
+    if key not in SECTIONS:
+        raise ValueError("未対応のストリンガ断面形状です: %s" % (name))
+    return SECTIONS[key]
@@ -33,6 +33,13 @@ except ImportError:  # for python2
 
 
 class Stage:
+    # get_deltaVの入力になる諸元と、get_deltaVで計算される量（Rocket.calcのキャッシュで使う）
+    INPUTS = ("s", "pc_rate", "jettison", "Isp", "thrust", "num_engine",
+              "nozzle_exit_area", "use_SeaLevel")
+    RESULTS = ("upper_mass", "mass_prop", "consumpsion_propellant", "residual_propellant", "mdot",
+               "burn_time", "mass_stracture", "mf", "m0", "deltaV",
+               "thrust_SL", "Isp_SL", "acc_ignition", "acc_cutoff")
+
     def __init__(self,
                  stracture_ratio,
                  propellant_consumption_rate=100,
@@ -89,6 +96,12 @@ class Stage:
     def set_upper_mass(self, upper_mass):
         self.upper_mass = upper_mass
 
+    def inputs(self):
+        return tuple(getattr(self, name) for name in self.INPUTS)
+
+    def results(self):
+        return dict((name, getattr(self, name)) for name in self.RESULTS)
+
     def get_deltaV(self, propellant):
         """有効推進剤[kg]を入れて⊿V[km/s]を計算
         Args:
@@ -220,13 +233,28 @@ class Rocket:
                     ("加速度＠点火時", "G"),
                     ("加速度＠CutOff", "G"),
                     ]
+        self.cache = {}  # calcの結果 {(推進剤, ペイロード, 各段の諸元): 各段の計算結果}
+        self.num_calc = 0  # calcで実際に各段を計算した回数
+
+    def cache_key(self, prop):
+        return (tuple(float(p) for p in prop), float(self.payload),
+                tuple(stage.inputs() for stage in self.stages))
 
     def calc(self, prop):
         """推進剤を入れた際の各段パラメータ計算
+
+        同じ推進剤、ペイロード、各段の諸元で計算済みなら、計算結果（Stage.RESULTS）を各段に戻すだけにする。
+        最適化では目的関数と各拘束条件が同じ点でcalcを呼ぶので、各段の計算は1点につき1回になる。
+        出力表はdisplay, to_excelのときに作る(make_output)。
         """
         assert len(prop) == self.num_stage, "引数は段数と一致するリスト"
-        self.output_a = []
-        self.index_a = []
+        key = self.cache_key(prop)
+        if key in self.cache:
+            (results, self.deltaV_sum) = self.cache[key]
+            for (stage, result) in zip(self.stages, results):
+                stage.__dict__.update(result)
+            return
+        self.num_calc += 1
         self.deltaV_sum = 0
         for stage in range(len(self.stages)-1, -1, -1):
             # 最上段ではペイロード重量を上段重量に足して、下の段では上段のm0を足す
@@ -236,6 +264,15 @@ class Rocket:
                 self.stages[stage].upper_mass = self.stages[stage+1].m0
             dV = self.stages[stage].get_deltaV(prop[stage])
             self.deltaV_sum += dV
+        if len(self.cache) >= 1024:  # 最適化を何度も回しても際限なく増えないようにする
+            self.cache.clear()
+        self.cache[key] = ([stage.results() for stage in self.stages], self.deltaV_sum)
+
+    def make_output(self):
+        """直前のcalcの結果から出力表を作る"""
+        self.output_a = []
+        self.index_a = []
+        for stage in range(len(self.stages)-1, -1, -1):
             # 出力のためにデータ整理
             sta = self.stages[stage]
             output = [np.around(sta.deltaV),
@@ -280,6 +317,7 @@ class Rocket:
 
     def display(self):
         """標準出力に出力する"""
+        self.make_output()
         self.df = pd.DataFrame(self.output_a, columns=self.col_multi, index = self.index_a)
         print(self.df.T)
 
@@ -288,6 +326,7 @@ class Rocket:
         Args:
             savefile (str, optional) : 保存ファイル名、ここで指定しなければ設定ファイルで指定した名前
         """
+        self.make_output()
         self.df = pd.DataFrame(self.output_a, columns=self.col_multi, index = self.index_a)
         if savefile == "":
             filename = self.name
@@ -309,15 +348,38 @@ class Rocket:
         # with open(self.setting_file, 'w') as sf:
         #     self.setting.write(sf)
 
+    def jacobian(self, prop):
+        """各段のm0, mf, ⊿Vの推進剤についての微分
+
+        m0_k = ペイロード + Σ_{j>=k} (b_j * prop_j + 投棄物_j)、mf_k = m0_k - 消費推進剤_k なので、
+        上段の推進剤は上段質量mu（upper_mass）を通して下の段に効き、微分は上三角行列になる。
+        Returns:
+            dm0, dmf, ddV (np.array) : [i, j]がi段目の値のj段目の推進剤[kg]についての微分、(段数, 段数)
+        """
+        g0 = 9.80665
+        self.calc(prop)
+        pc = np.array([stage.pc_rate for stage in self.stages])
+        s = np.array([stage.s for stage in self.stages])
+        b = (1 - s) / s + 1  # 推進剤1kgあたりのm0の増分（構造 + 推進剤）
+        m0 = np.array([stage.m0 for stage in self.stages])
+        mf = np.array([stage.mf for stage in self.stages])
+        Isp = np.array([stage.Isp for stage in self.stages])
+        dm0 = np.triu(np.tile(b, (self.num_stage, 1)))
+        dmf = dm0 - np.diag(pc)
+        ddV = (Isp * g0)[:, np.newaxis] * (dm0 / m0[:, np.newaxis] - dmf / mf[:, np.newaxis])
+        return dm0, dmf, ddV
+
     def deltaV(self, prop):
         """⊿Vの合計と目標⊿Vの差分の絶対値
         """
         self.calc(prop)
-        self.deltaV_sum = 0
-        for i, stage in enumerate(self.stages):
-            self.deltaV_sum += stage.get_deltaV(prop[i])
         return abs(self.deltaV_sum - self.target_deltaV)
 
+    def deltaV_jac(self, prop):
+        """deltaVの勾配（差分0では増える側の勾配）"""
+        ddV = self.jacobian(prop)[2]
+        return np.where(self.deltaV_sum >= self.target_deltaV, 1.0, -1.0) * ddV.sum(axis=0)
+
     """
     以下は⊿Vを変化させたときのペイロード重量を求めるための目的関数
     """
@@ -335,31 +397,61 @@ class Rocket:
         self.calc(prop)  # 計算しておく
         return self.stages[0].m0
 
+    def initial_mass_jac(self, prop):
+        """initial_massの勾配"""
+        return self.jacobian(prop)[0][0]
+
+    def stracture_jac(self, stage):
+        """stage段目の構造重量の勾配"""
+        grad = np.zeros(self.num_stage)
+        grad[stage] = (1 - self.stages[stage].s) / self.stages[stage].s
+        return grad
+
+    def acceralation_jac(self, prop, stage):
+        """stage段目の燃焼終了時の加速度の勾配"""
+        dmf = self.jacobian(prop)[1]
+        return - self.stages[stage].acc_cutoff * dmf[stage] / self.stages[stage].mf
+
     def limit_stracture1(self, prop, limit):
         """1段目の構造効率"""
         self.calc(prop)
         return self.stages[0].mass_stracture - limit
 
+    def limit_stracture1_jac(self, prop, limit):
+        return self.stracture_jac(0)
+
     def limit_stracture(self, prop, limit):
         """2段目の構造効率"""
         self.calc(prop)
         return self.stages[1].mass_stracture - limit
 
+    def limit_stracture_jac(self, prop, limit):
+        return self.stracture_jac(1)
+
     def limit_acceralation1(self, prop, limit_acc):
         """1段目の加速度上限"""
         self.calc(prop)
         return limit_acc - self.stages[0].acc_cutoff
 
+    def limit_acceralation1_jac(self, prop, limit_acc):
+        return - self.acceralation_jac(prop, 0)
+
     def limit_acceralation2(self, prop, limit_acc):
         """2段目の加速度上限"""
         self.calc(prop)
         return limit_acc - self.stages[1].acc_cutoff
 
+    def limit_acceralation2_jac(self, prop, limit_acc):
+        return - self.acceralation_jac(prop, 1)
+
     def limit_V2(self, prop, limit):
         """2段目の⊿V"""
         self.calc(prop)
         return self.stages[1].deltaV - limit
 
+    def limit_V2_jac(self, prop, limit):
+        return self.jacobian(prop)[2][1]
+
 
 if __name__ == '__main__':
     print("==== 多段ロケットの最適質量配分問題 ====")
@@ -377,14 +469,19 @@ if __name__ == '__main__':
     bounds = [[1, np.inf]] * len(rocket.stages)  # 推進剤の上限下限設定のおまじない
     mass_limit_2nd = limit.getfloat("2段","2段目重量下限値[kg]") # ２段目の構造重量の下限
     cons = ({'type': 'eq',
-             'fun': lambda prop: rocket.deltaV(prop)},
+             'fun': lambda prop: rocket.deltaV(prop),
+             'jac': lambda prop: rocket.deltaV_jac(prop)},
             {'type': 'ineq',  # 不等式拘束条件 (returnの中身) > 0
              'fun': lambda prop, limit: rocket.limit_stracture(prop, limit),
+             'jac': lambda prop, limit: rocket.limit_stracture_jac(prop, limit),
              'args': (mass_limit_2nd,)})
     result = optimize.minimize(rocket.initial_mass, prop0, method="SLSQP",
+                               jac=rocket.initial_mass_jac,  # 勾配は解析的に与える（差分のためのcalcが不要）
                                constraints=cons,
                                bounds=bounds)
     print(result)
     print(result.x)
+    print("各段の計算回数 : %d" % (rocket.num_calc))
+    rocket.calc(result.x)
     rocket.display()
     #rocket.to_excel()